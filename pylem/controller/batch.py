@@ -0,0 +1,94 @@
+'''
+Created on Oct 18, 2026
+
+@author: kevinmendoza
+'''
+from pylem.controller.controller import MainController
+
+
+class BatchController(MainController):
+    # Stands in for the gui controller on headless runs. The config holds
+    # one dict per Params object of MainController, optional processes are
+    # switched on with 'enabled'. Defaults match the gui widgets.
+    default_config = {
+        'simulation': {
+            'Time'                    : 1,
+            'Iterations/Time Interval': 1.0,
+            'X Dimension Extent'      : 100,
+            'Y Dimension Extent'      : 100,
+            'Cell Width'              : 10,
+            'Precision'               : 'float64',
+            'Checkpoint Interval'     : 0,
+            'Checkpoint Directory'    : 'checkpoints',
+            'Output Interval'         : 0,
+            'Output Directory'        : 'history',
+        },
+        'surface': {
+            'type'     : 'random',
+            'seed'     : 1,
+            'divisions': 1,
+            'weight'   : 1,
+            'mean'     : 0,
+        },
+        'geology': {
+            'enabled' : False,
+            'Rate'    : 0.1,
+            'Azimuth' : 0,
+            'X Center': 10,
+            'Y Center': 10,
+        },
+        'waterbot': {
+            'enabled'             : False,
+            'Solver'              : 'stream power',
+            'Gradient Constant'   : 1.0,
+            'Exponential Law'     : 1.0,
+            'Gradient Offset'     : 0.0,
+            'Base Offset'         : 0.0,
+            'Sediment Discharge %': 10.0,
+        },
+        'hillslope': {
+            'enabled'          : False,
+            'Gradient Constant': 1.0,
+            'Mode'             : 'explicit',
+            'Stencil'          : '5-point',
+        },
+    }
+
+    def __init__(self,model,config):
+        super().__init__(model,None)
+        self.surface  = None
+        self.progress = (0,0.0)
+        self.totals   = (0,0.0)
+        self.load_config(config)
+
+    def load_config(self,config):
+        sections = {
+            'simulation': self.simulation_params,
+            'surface'   : self.surface_params,
+            'geology'   : self.geology_params,
+            'waterbot'  : self.waterbot_params,
+            'hillslope' : self.hillslope_params,
+        }
+        for name, params in sections.items():
+            section = {**self.default_config[name],**(config.get(name) or {})}
+            enabled = section.pop('enabled',False)
+            for key, value in section.items():
+                params.assign_value(key,value)
+            if enabled and not params.is_enabled():
+                params.change_enable()
+
+    def update(self):
+        pass
+
+    def wants_surface(self,step=None):
+        # only the initial and final surfaces are kept, nothing in between
+        return False
+
+    def publish_surface(self,matrix):
+        self.surface = matrix
+
+    def publish_iterations(self,iterations,year):
+        self.progress = (iterations,year)
+
+    def publish_total_iterations(self,iterations,year):
+        self.totals = (iterations,year)
@@ -1,5 +1,9 @@
+import time
+from pylem.model.worker import LatestValue, SimulationWorker
+
 
 class MainController():
+    debounce_interval = 0.15 # s without parameter changes before a preview is rebuilt
 
     def __init__(self,model,app):
         self.app=app
@@ -13,10 +17,36 @@ class MainController():
         self.unit_convert.add_controller(self)
         self.time_update_list = []
         self.space_update_list= []
-
-    def start_simulation(self):
+        self.surface_channel  = LatestValue()
+        self.progress_channel = LatestValue()
+        self.totals_channel   = LatestValue()
+        self.preview_channel  = LatestValue()
+        self.error_channel    = LatestValue()
+        self.render_policy    = RenderPolicy()
+        self.rebuild          = None
+        self._rebuild_due     = None
+        self._generation      = 0
+
+    def start_simulation(self,confirmed=False):
+        # runs over the cost budget need an explicit confirmation, their
+        # estimate is returned instead of starting them
+        estimate = self.model.estimate_cost(self)
+        if estimate.over_budget() and not confirmed:
+            return estimate
         print('starting simulation')
+        self.render_policy.reset()
+        self._reset_surface()
         self.model.start_simulation(self)
+        return None
+
+    def pause_simulation(self):
+        self.model.pause_simulation()
+
+    def resume_simulation(self):
+        self.model.resume_simulation()
+
+    def cancel_simulation(self):
+        self.model.cancel_simulation()
 
     def initialize(self):
         self.update_map()
@@ -33,6 +63,15 @@ class MainController():
     def _update_map(self,*args,**kwargs):
         pass
 
+    def _update_render_stats(self,*args,**kwargs):
+        pass
+
+    def _reset_surface(self,*args,**kwargs):
+        pass
+
+    def _report_error(self,error):
+        print('simulation failed: {0!r}'.format(error))
+
 
     def update(self):
         self.app.processEvents()
@@ -57,6 +96,84 @@ class MainController():
         self._update_total_iterations(iterations,year)
         self.update()
 
+    ### worker thread updates, drawn on the gui thread by flush_updates ###
+
+    def wants_surface(self,step=None):
+        # decided before the surface is copied, a skipped step costs nothing
+        if self.surface_channel.is_empty() and self.render_policy.due(step):
+            return True
+        self.render_policy.record_drop()
+        return False
+
+    def publish_surface(self,matrix):
+        self.surface_channel.publish(matrix)
+
+    def publish_iterations(self,iterations,year):
+        self.progress_channel.publish((iterations,year))
+
+    def publish_total_iterations(self,iterations,year):
+        self.totals_channel.publish((iterations,year))
+
+    def clear_channels(self):
+        for channel in (self.surface_channel,self.progress_channel,self.totals_channel):
+            channel.take()
+
+    def publish_preview(self,generation,matrix):
+        self.preview_channel.publish((generation,matrix))
+
+    def flush_updates(self):
+        self._start_due_rebuild()
+        error = self.error_channel.take()
+        if error is not None:
+            self._report_error(error)
+        preview = self.preview_channel.take()
+        if preview is not None and preview[0] == self._generation:
+            # a new preview is a new surface, its colours are scaled afresh
+            self._reset_surface()
+            self._render(preview[1])
+        totals = self.totals_channel.take()
+        if totals is not None:
+            self._update_total_iterations(*totals)
+        progress = self.progress_channel.take()
+        if progress is not None:
+            self._update_iterations(*progress)
+        matrix = self.surface_channel.take()
+        if matrix is not None:
+            self._render(matrix)
+
+    def _render(self,matrix):
+        start = time.perf_counter()
+        self._update_surface(matrix)
+        self.render_policy.record_render(time.perf_counter() - start)
+        self._update_render_stats(self.render_policy)
+
+    def set_render_params(self,key,value,**kwargs):
+        self.render_policy.set_param(key,value)
+
+    ### coalesced preview rebuilds ###
+
+    def request_surface_update(self):
+        # trailing edge debounce: every change pushes the rebuild back and
+        # makes whatever rebuild is still running stale
+        self._generation  += 1
+        self._rebuild_due  = time.monotonic() + self.debounce_interval
+        if self.rebuild is not None:
+            self.rebuild.cancel()
+
+    def _start_due_rebuild(self):
+        # at most one rebuild in flight, the next one waits for it to finish
+        if self.rebuild is not None:
+            if self.rebuild.is_alive():
+                return
+            self.rebuild = None
+        if self._rebuild_due is None or time.monotonic() < self._rebuild_due:
+            return
+        self._rebuild_due = None
+        self.update_map()
+        self.rebuild = SimulationWorker(self.model.preview_surface,self,self._generation,
+                                        errors=self.error_channel)
+        self.rebuild.start()
+
     def add_space_unit(self,function):
         self.space_update_list.append(function)
 
@@ -73,8 +190,7 @@ class MainController():
         for function in self.space_update_list:
             function(multiplier,**kwargs)
 
-        self.update_map()
-        self.model.update_surface(self)
+        self.request_surface_update()
 
     ###  geology/physics/process enabled checks ###
 
@@ -122,8 +238,7 @@ class MainController():
             self.surface_params.assign_value(key, value,**kwargs)
 
         if update_controller:
-            self.update_map()
-            self.model.update_surface(self)
+            self.request_surface_update()
     
     def set_waterbot_params(self,key,value,**kwargs):
         self.waterbot_params.assign_value(key,value,**kwargs)
@@ -134,8 +249,7 @@ class MainController():
     def set_simulation_params(self,key,value,update_controller=True,**kwargs):
         self.simulation_params.assign_value(key,value,**kwargs)
         if update_controller:
-            self.update_map()
-            self.model.update_surface(self)
+            self.request_surface_update()
         
     def set_geology_params(self,key,value,update_controller=True,**kwargs):
         self.geology_params.assign_value(key, value,**kwargs)
@@ -157,6 +271,16 @@ class MainController():
     
     def get_surface_params(self):
         return self.surface_params.get_params()
+
+    def get_config(self):
+        # every parameter set in the layout of the headless configs
+        return {
+            'simulation': self.get_simulation_params(),
+            'surface'   : self.get_surface_params(),
+            'geology'   : {'enabled': self.geology_params_enabled(),**self.get_geology_params()},
+            'waterbot'  : {'enabled': self.waterbot_params_enabled(),**self.get_waterbot_params()},
+            'hillslope' : {'enabled': self.hillslope_params_enable(),**self.get_hillslope_params()},
+        }
     
 
 
@@ -224,6 +348,51 @@ class UnitConvert():
         pass
 
 
+class RenderPolicy():
+    # How often the solver hands a surface to the gui: at most 'rate' frames
+    # per second, every 'rate'th step or every 'rate' seconds of wall clock.
+    modes = ['max fps','every nth step','interval (s)']
+
+    def __init__(self,mode='max fps',rate=30):
+        self.mode  = mode
+        self.rate  = float(rate)
+        self.reset()
+
+    def reset(self):
+        self._last     = None
+        self.rendered  = 0
+        self.dropped   = 0
+        self.render_ms = 0.0
+
+    def set_param(self,key,value):
+        if key == 'Render Mode' and value in self.modes:
+            self.mode = value
+        elif key == 'Render Rate':
+            try:
+                if float(value) > 0:
+                    self.rate = float(value)
+            except ValueError:
+                pass
+
+    def due(self,step=None):
+        if self.mode == 'every nth step':
+            return step is None or step % max(1,int(self.rate)) == 0
+        now  = time.monotonic()
+        wait = 1.0/self.rate if self.mode == 'max fps' else self.rate
+        if self._last is None or now - self._last >= wait:
+            self._last = now
+            return True
+        return False
+
+    def record_drop(self):
+        self.dropped += 1
+
+    def record_render(self,seconds):
+        # smoothed so the readout does not jitter
+        self.rendered += 1
+        weight         = 1.0 if self.rendered == 1 else 0.2
+        self.render_ms+= weight*(1000*seconds - self.render_ms)
+
 # Param container class
 class Params():
     
@@ -264,7 +433,10 @@ class BriefParams():
 
 
     def set_controller_update(self,controller: MainController):
+        # values collected before the controller was attached are sent once
         self.controller=controller
+        for key, value in self.param.items():
+            self.controller(key,value,update_controller=False)
 
     def change_enable(self):
         self.enabled = not self.enabled
@@ -274,10 +446,10 @@ class BriefParams():
         pass
 
     def change_param(self, key, value, update_controller=True):
+        # only the changed value is forwarded, the controller keeps the rest
         self.param[key]=value
         if self.controller:
-            for key, value in self.param.items():
-                self.controller(key,value,update_controller=False)
+            self.controller(key,value,update_controller=False)
 
         if update_controller:
             self.update()
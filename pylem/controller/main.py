@@ -5,9 +5,12 @@ from pylem.view.param_view import OptionalPhysicsView
 from pylem.view.simulate_view import SimulationParams
 from pylem.view.graphics import Surface
 from PyQt5.QtWidgets import QApplication, QWidget, QGridLayout
+from PyQt5.QtCore import QTimer
 
 
 class Main():
+    frame_interval = 33 # ms between gui refreshes of the simulation output
+
     def __init__(self,app):
         self.main_view = MainView()
         self.main_view.show()
@@ -15,9 +18,13 @@ class Main():
         self.main_controller = MainController(self.main_model,app)
         self.main_view.add_controller(self.main_controller)
         self.main_controller.initialize()
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.main_controller.flush_updates)
+        self.timer.start(self.frame_interval)
         
     def exit(self):
         #Exit the program, for now, no confirmation
+        self.main_controller.cancel_simulation()
         QApplication.quit()
         
         
@@ -0,0 +1,70 @@
+'''
+Created on Oct 18, 2026
+
+@author: kevinmendoza
+'''
+import os
+import threading
+from collections import OrderedDict
+
+# simulation parameters that change the initial surface grid
+grid_keys = ['X Dimension Extent','Y Dimension Extent','Cell Width','Precision']
+
+
+def normalize_value(value):
+    # '10', '10.0' and 10 are the same parameter
+    try:
+        return float(value)
+    except (TypeError,ValueError):
+        return str(value)
+
+class SurfaceCache:
+    # least recently used initial surfaces, evicted once their total size
+    # exceeds max_bytes
+    max_bytes = 256*2**20
+
+    def __init__(self,max_bytes=None):
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock    = threading.Lock()
+        self.nbytes   = 0
+
+    def make_key(self,surface,simulation):
+        params = {key: normalize_value(value) for key, value in surface.items() if key != 'enable'}
+        for key in grid_keys:
+            params[key] = normalize_value(simulation.get(key))
+        path = surface.get('file')
+        if path and os.path.isfile(str(path)):
+            # an edited DEM is a different surface
+            params['file mtime'] = os.path.getmtime(str(path))
+        return tuple(sorted(params.items(),key=lambda item: item[0]))
+
+    def get(self,key):
+        with self._lock:
+            surface = self._entries.get(key)
+            if surface is not None:
+                self._entries.move_to_end(key)
+            return surface
+
+    def put(self,key,surface):
+        if surface.nbytes > self.max_bytes:
+            return
+        # shared with every caller, nobody may modify it in place
+        surface.setflags(write=False)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes-= self._entries.pop(key).nbytes
+            self._entries[key] = surface
+            self.nbytes       += surface.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted   = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,74 @@
+'''
+Created on Oct 18, 2026
+
+@author: kevinmendoza
+'''
+import numpy as np
+
+
+class CostEstimate:
+
+    def __init__(self,shape,memory,seconds_per_step,cost_model):
+        self.shape            = shape
+        self.cells            = shape[0]*shape[1]
+        self.memory           = memory
+        self.seconds_per_step = seconds_per_step
+        self.cost_model       = cost_model
+
+    def exceeds_memory(self):
+        return self.memory > self.cost_model.memory_budget
+
+    def over_budget(self):
+        return self.exceeds_memory() or self.seconds_per_step > self.cost_model.time_budget
+
+    def preview_scale(self):
+        # factor on Cell Width that brings an oversized grid down to
+        # preview_cells, 1 when the grid can be previewed as it is
+        if not self.exceeds_memory() or self.cells <= self.cost_model.preview_cells:
+            return 1.0
+        return float(np.sqrt(self.cells / self.cost_model.preview_cells))
+
+    def describe(self):
+        return '{0}x{1} cells, about {2:.1f} MiB and {3:.2g} s per step'.format(
+            self.shape[0],self.shape[1],self.memory/2**20,self.seconds_per_step)
+
+class CostModel:
+    # Rough per-cell costs of a landscape and each process, measured on a
+    # laptop. Memory is (arrays of the landscape dtype, fixed bytes) per cell,
+    # the fixed part covering index arrays and float64 accumulations. Hillslope
+    # creep always works in float64, the 9-point implicit solve also builds a
+    # sparse operator of 9 entries per cell from coordinate lists.
+    memory_budget = 2*2**30 # bytes
+    time_budget   = 5.0     # s per step
+    preview_cells = 250000
+    bytes_per_cell = {
+        'landscape'                 : (6,16),
+        'geology'                   : (1,1),
+        'stream power'              : (4,48),
+        'implicit'                  : (5,48),
+        'waterbot'                  : (2,24),
+        'hillslope'                 : (0,40),
+        'hillslope implicit'        : (0,112),
+        'hillslope implicit 9-point': (0,600),
+    }
+    seconds_per_cell = {
+        'landscape'                 : 1e-8,
+        'geology'                   : 5e-9,
+        'stream power'              : 9e-7,
+        'implicit'                  : 9e-7,
+        'waterbot'                  : 4e-6,
+        'hillslope'                 : 4e-8,
+        'hillslope implicit'        : 6e-8,
+        'hillslope implicit 9-point': 7e-7,
+    }
+
+    def estimate(self,shape,processes=(),dtype=np.float64):
+        cells    = float(shape[0])*float(shape[1])
+        itemsize = np.dtype(dtype).itemsize
+        memory   = 0.0
+        seconds  = 0.0
+        for process in ('landscape',) + tuple(processes):
+            arrays, fixed = self.bytes_per_cell.get(process,(0,0))
+            memory       += cells*(arrays*itemsize + fixed)
+            seconds      += cells*self.seconds_per_cell.get(process,0)
+        return CostEstimate(shape,memory,seconds,self)
@@ -0,0 +1,222 @@
+'''
+Created on Oct 18, 2026
+
+@author: kevinmendoza
+'''
+import json
+import os
+import queue
+import threading
+import zlib
+import numpy as np
+
+# Time series of landscape fields in a zarr-like directory:
+#
+#   history/meta.json                  shape, chunking, fields, step and time of every frame
+#   history/elevation/<t>.<y>.<x>      zlib compressed raw chunk of frames x rows x columns
+#   history/sediment/<t>.<y>.<x>
+#
+# Chunks are written once a block of frames is complete, meta.json is replaced
+# atomically afterwards so a reader never sees frames without their chunks.
+# sync() also writes the incomplete trailing chunk, it is rewritten whole
+# once its block fills up.
+
+
+def _chunk_name(directory,field,t,y,x):
+    return os.path.join(directory,field,'{0}.{1}.{2}'.format(t,y,x))
+
+def _write_meta(directory,meta):
+    path = os.path.join(directory,'meta.json')
+    with open(path+'.tmp','w') as stream:
+        json.dump(meta,stream)
+    os.replace(path+'.tmp',path)
+
+def _read_meta(directory):
+    with open(os.path.join(directory,'meta.json')) as stream:
+        return json.load(stream)
+
+class HistoryWriter:
+    fields      = ('elevation','sediment')
+    frames      = 16
+    tile        = 256
+    compression = 1
+    pending     = 16 # frames queued for the writer before append blocks
+
+    def __init__(self,directory,shape,dtype=np.float64,start_step=0):
+        self.directory = directory
+        self.shape     = tuple(shape)
+        self.dtype     = np.dtype(dtype)
+        self.chunks    = (self.frames,min(self.tile,self.shape[0]),min(self.tile,self.shape[1]))
+        self._buffer   = []
+        self._queue    = queue.Queue(maxsize=self.pending)
+        self._error    = None
+        self._open(start_step)
+        self._written  = len(self.meta['steps'])
+        self._thread   = threading.Thread(target=self._drain,daemon=True)
+        self._thread.start()
+
+    def _open(self,start_step):
+        # a resumed run keeps the frames up to its checkpoint and refills the
+        # incomplete trailing chunk so that it is rewritten whole
+        for field in self.fields:
+            os.makedirs(os.path.join(self.directory,field),exist_ok=True)
+        self.meta = {'shape': list(self.shape),'dtype': self.dtype.str,'chunks': list(self.chunks),
+                     'fields': list(self.fields),'steps': [],'times': []}
+        if start_step <= 0 or not os.path.exists(os.path.join(self.directory,'meta.json')):
+            return
+        previous = _read_meta(self.directory)
+        if any(previous[key] != self.meta[key] for key in ('shape','chunks','dtype')):
+            raise ValueError('history in {0} does not match the landscape'.format(self.directory))
+        kept   = sum(1 for step in previous['steps'] if step <= start_step)
+        start  = kept - kept % self.frames
+        reader = HistoryReader(self.directory)
+        for index in range(start,kept):
+            frame = {field: reader[field][index] for field in self.fields}
+            self._buffer.append((previous['steps'][index],previous['times'][index],frame))
+        self.meta['steps'] = previous['steps'][:start]
+        self.meta['times'] = previous['times'][:start]
+
+    def append(self,step,time,landscape):
+        # only the copy happens on the solver thread, compression and disk
+        # writes are left to the background thread
+        if self._error is not None:
+            raise self._error
+        frame = {
+            'elevation': landscape.matrix.get_elevation_matrix().astype(self.dtype,copy=False),
+            'sediment' : np.array(landscape.matrix.get_sediment_matrix(),dtype=self.dtype),
+        }
+        self._queue.put((step,time,frame))
+
+    def sync(self):
+        # blocks until every appended frame is on disk, e.g. before a
+        # checkpoint so a resumed run finds the history up to it
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _drain(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    if self._error is None:
+                        self._flush()
+                    return
+                if isinstance(item,threading.Event):
+                    if self._error is None:
+                        self._flush()
+                    item.set()
+                elif self._error is None:
+                    self._buffer.append(item)
+                    if len(self._buffer) == self.frames:
+                        self._flush()
+            except Exception as error:
+                # frames are dropped from here on, append raises the error
+                # and nobody blocks on the bounded queue
+                self._error = error
+                if isinstance(item,threading.Event):
+                    item.set()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        t = self._written // self.frames
+        for field in self.fields:
+            block = np.stack([frame[field] for _, _, frame in self._buffer])
+            for y in range(0,self.shape[0],self.chunks[1]):
+                for x in range(0,self.shape[1],self.chunks[2]):
+                    chunk = np.ascontiguousarray(block[:,y:y+self.chunks[1],x:x+self.chunks[2]])
+                    path  = _chunk_name(self.directory,field,t,y // self.chunks[1],x // self.chunks[2])
+                    with open(path,'wb') as stream:
+                        stream.write(zlib.compress(chunk.tobytes(),self.compression))
+        self.meta['steps'] = self.meta['steps'][:self._written] + [step for step, _, _ in self._buffer]
+        self.meta['times'] = self.meta['times'][:self._written] + [time for _, time, _ in self._buffer]
+        _write_meta(self.directory,self.meta)
+        if len(self._buffer) == self.frames:
+            self._written+= self.frames
+            self._buffer  = []
+
+class HistoryField:
+    # array-like view of one field, indexing only decompresses the chunks
+    # that overlap the requested frames and window
+    def __init__(self,directory,field,meta):
+        self.directory = directory
+        self.field     = field
+        self.dtype     = np.dtype(meta['dtype'])
+        self.chunks    = tuple(meta['chunks'])
+        self.shape     = (len(meta['steps']),) + tuple(meta['shape'])
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self,key):
+        if not isinstance(key,tuple):
+            key = (key,)
+        key     = key + (slice(None),)*(3-len(key))
+        squeeze = [axis for axis, index in enumerate(key) if isinstance(index,(int,np.integer))]
+        bounds  = []
+        for axis, index in enumerate(key):
+            if axis in squeeze:
+                index = index + self.shape[axis] if index < 0 else index
+                if not 0 <= index < self.shape[axis]:
+                    raise IndexError('index {0} is out of bounds for axis {1}'.format(index,axis))
+                index = slice(index,index+1)
+            start, stop, stride = index.indices(self.shape[axis])
+            if stride != 1:
+                raise ValueError('history slices must be contiguous')
+            bounds.append((start,max(start,stop)))
+        result = np.empty([stop-start for start, stop in bounds],dtype=self.dtype)
+        for t in range(bounds[0][0] // self.chunks[0],-(-bounds[0][1] // self.chunks[0])):
+            for y in range(bounds[1][0] // self.chunks[1],-(-bounds[1][1] // self.chunks[1])):
+                for x in range(bounds[2][0] // self.chunks[2],-(-bounds[2][1] // self.chunks[2])):
+                    self._copy_chunk(t,y,x,bounds,result)
+        return result.squeeze(axis=tuple(squeeze)) if squeeze else result
+
+    def _copy_chunk(self,t,y,x,bounds,result):
+        origin = (t*self.chunks[0],y*self.chunks[1],x*self.chunks[2])
+        extent = [min(self.chunks[axis],self.shape[axis]-origin[axis]) for axis in range(3)]
+        with open(_chunk_name(self.directory,self.field,t,y,x),'rb') as stream:
+            chunk = np.frombuffer(zlib.decompress(stream.read()),dtype=self.dtype)
+        # a trailing chunk may hold more frames than meta.json announces yet
+        chunk  = chunk.reshape((-1,extent[1],extent[2]))[:extent[0]]
+        source = []
+        target = []
+        for axis in range(3):
+            start = max(bounds[axis][0],origin[axis])
+            stop  = min(bounds[axis][1],origin[axis]+extent[axis])
+            source.append(slice(start-origin[axis],stop-origin[axis]))
+            target.append(slice(start-bounds[axis][0],stop-bounds[axis][0]))
+        result[tuple(target)] = chunk[tuple(source)]
+
+class HistoryReader:
+
+    def __init__(self,directory):
+        self.directory = directory
+        self.meta      = _read_meta(directory)
+        self.steps     = np.asarray(self.meta['steps'],dtype=np.int64)
+        self.times     = np.asarray(self.meta['times'],dtype=np.float64)
+
+    def __getitem__(self,field):
+        if field not in self.meta['fields']:
+            raise KeyError(field)
+        return HistoryField(self.directory,field,self.meta)
+
+    def __len__(self):
+        return self.steps.shape[0]
+
+    def time_range(self,start=None,end=None):
+        # frames with start <= time <= end as a slice for indexing fields
+        first = 0 if start is None else int(np.searchsorted(self.times,start,side='left'))
+        last  = len(self) if end is None else int(np.searchsorted(self.times,end,side='right'))
+        return slice(first,last)
+
+    def read(self,field,start=None,end=None,rows=slice(None),columns=slice(None)):
+        return self[field][self.time_range(start,end),rows,columns]
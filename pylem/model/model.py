@@ -10,41 +10,221 @@ import threading
 from pylem.controller.controller import MainController
 from pylem.physics.landscape import Landscape
 from pylem.physics.surface import InitialSurface, GeoForcing
+from pylem.physics.erosion import StreamPowerErosion, ImplicitStreamPower, HillslopeCreep, WaterBotSimulate
+from pylem.model.worker import SimulationWorker
+from pylem.model.history import HistoryWriter
+from pylem.model.cache import SurfaceCache
+from pylem.model.cost import CostModel
 
 class MainModel():
+    erosion_solvers = {
+        'stream power': StreamPowerErosion,
+        'implicit'    : ImplicitStreamPower,
+        'waterbot'    : WaterBotSimulate,
+    }
     
     def __init__(self):
-        pass
+        self.worker        = None
+        self.surface_cache = SurfaceCache()
+        self.cost_model    = CostModel()
     
     def update_surface(self,controller: MainController):
         print('updating plot')
-        landscape       = self.generate_landscape(controller)
-        initial_surface = self.create_initial_surface_operator(controller)
-        geoForcing      = self.create_geoforcing_operator(controller)
-        landscape.assign_elevations(initial_surface)
-        controller.update_surface(landscape.get_update())
+        controller.update_surface(self.get_initial_surface(controller,preview=True))
+
+    def preview_surface(self,controller: MainController,generation,control=None):
+        # runs on a rebuild thread, a cancelled rebuild is simply dropped. It
+        # may overlap a running simulation, which is safe as surfaces never
+        # touch the global random state or the run's own generator
+        try:
+            surface = self.get_initial_surface(controller,preview=True)
+        except ValueError:
+            # half typed values such as a Cell Width of 0
+            return
+        if control is None or not control.is_cancelled():
+            controller.publish_preview(generation,surface)
+
+    def get_initial_surface(self,controller: MainController,preview=False):
+        # previews of parameter sets seen before come straight from the cache
+        simulation = controller.get_simulation_params()
+        if preview:
+            simulation = self.get_preview_params(controller)
+        key     = self.surface_cache.make_key(controller.get_surface_params(),simulation)
+        surface = self.surface_cache.get(key)
+        if surface is None:
+            landscape = self.generate_landscape(controller,simulation)
+            landscape.assign_elevations(self.create_initial_surface_operator(controller,simulation))
+            surface   = landscape.get_update()
+            self.surface_cache.put(key,surface)
+        return surface
+
+    def get_processes(self,controller: MainController):
+        processes = []
+        if controller.geology_params_enabled():
+            processes.append('geology')
+        if controller.waterbot_params_enabled():
+            solver = controller.get_waterbot_params().get('Solver')
+            processes.append(solver if solver in self.erosion_solvers else 'stream power')
+        if controller.hillslope_params_enable():
+            hillslope = controller.get_hillslope_params()
+            if hillslope.get('Mode') != 'implicit':
+                processes.append('hillslope')
+            elif hillslope.get('Stencil') == '9-point':
+                processes.append('hillslope implicit 9-point')
+            else:
+                processes.append('hillslope implicit')
+        return processes
+
+    def estimate_cost(self,controller: MainController,simulation=None):
+        if simulation is None:
+            simulation = controller.get_simulation_params()
+        shape = Landscape.get_shape(simulation)
+        return self.cost_model.estimate(shape,self.get_processes(controller),Landscape.get_dtype(simulation))
+
+    def get_preview_params(self,controller: MainController):
+        # grids over the memory budget are previewed at a coarser cell width,
+        # only a confirmed run allocates them in full
+        simulation = controller.get_simulation_params()
+        scale      = self.estimate_cost(controller,simulation).preview_scale()
+        if scale > 1:
+            simulation = {**simulation,'Cell Width': float(simulation['Cell Width'])*scale}
+        return simulation
 
     def start_simulation(self,controller: MainController):
+        # the run happens on a worker thread, results reach the gui through
+        # the controller's publish_* channels. The parameters are read here
+        # on the gui thread, edits made while the run goes on must not end
+        # up in its checkpoints.
+        previous = self.worker
+        self.cancel_simulation()
+        self.worker = SimulationWorker(self.run_after,previous,controller,config=controller.get_config(),
+                                       errors=controller.error_channel)
+        self.worker.start()
+
+    def run_after(self,previous,controller: MainController,control=None,config=None):
+        # A previous run is joined here on the new worker, not on the gui, so
+        # it can not publish, write history or checkpoint alongside this one.
+        # It stops at its next step, whatever it left unread is dropped.
+        if previous is not None:
+            previous.join()
+        controller.clear_channels()
+        if control is not None and control.is_cancelled():
+            return None
+        return self.run_simulation(controller,control=control,config=config)
+
+    def pause_simulation(self):
+        if self.worker:
+            self.worker.pause()
+
+    def resume_simulation(self):
+        if self.worker:
+            self.worker.resume()
+
+    def cancel_simulation(self,wait=False):
+        # the run stops at its next step, wait blocks until it has
+        if self.worker:
+            self.worker.cancel()
+            if wait:
+                self.worker.join()
+            self.worker = None
+
+    def run_simulation(self,controller: MainController,control=None,initial_surface=None,config=None):
         landscape       = self.generate_landscape(controller)
-        initial_surface = self.create_initial_surface_operator(controller)
+        if initial_surface is None:
+            initial_surface = InitialSurface({'type':'array','array':self.get_initial_surface(controller)})
         physics_list    = self.create_physics_list(controller)
         # update plot
         landscape.assign_elevations(initial_surface)
-        controller.update_surface(landscape.get_update())
+        controller.publish_surface(landscape.get_update())
+        self.run(controller,landscape,physics_list,control=control,config=config)
+        return landscape
+
+    def run_from_checkpoint(self,controller: MainController,directory,control=None):
+        landscape, state = Landscape.from_checkpoint(directory)
+        physics_list     = self.create_physics_list(controller)
+        controller.publish_surface(landscape.get_update())
+        self.run(controller,landscape,physics_list,control=control,start_step=state['step'])
+        return landscape
+
+    def get_time_steps(self,controller: MainController):
+        simulation = controller.get_simulation_params()
+        total_time = float(simulation.get('Time',1))
+        per_time   = float(simulation.get('Iterations/Time Interval',1))
+        if per_time <= 0 or total_time <= 0:
+            return 0, 0.0
+        return int(round(total_time*per_time)), 1.0/per_time
+
+    def get_checkpointing(self,controller: MainController):
+        simulation = controller.get_simulation_params()
+        interval   = int(simulation.get('Checkpoint Interval',0))
+        directory  = str(simulation.get('Checkpoint Directory','checkpoints'))
+        return interval, directory
+
+    def get_history_writer(self,controller: MainController,landscape: Landscape,start_step=0):
+        simulation = controller.get_simulation_params()
+        interval   = int(simulation.get('Output Interval',0))
+        if interval <= 0:
+            return 0, None
+        directory  = str(simulation.get('Output Directory','history'))
+        return interval, HistoryWriter(directory,landscape.shape,dtype=landscape.dtype,start_step=start_step)
+
+    def run(self,controller: MainController,landscape: Landscape,physics_list,control=None,start_step=0,config=None):
+        # the landscape is stepped in place, nothing is reallocated per step
+        # and a snapshot is only copied once the gui took the previous one
+        # checkpoints store the parameters the run started with
+        config              = config or controller.get_config()
+        steps, dt           = self.get_time_steps(controller)
+        interval, directory = self.get_checkpointing(controller)
+        every, history      = self.get_history_writer(controller,landscape,start_step)
+        controller.publish_total_iterations(steps,steps*dt)
+        if history is not None and start_step == 0:
+            history.append(0,0.0,landscape)
+        try:
+            for step in range(start_step+1,steps+1):
+                if control is not None and not control.proceed():
+                    break
+                landscape.step(physics_list,dt=dt)
+                controller.publish_iterations(step,step*dt)
+                if step == steps or controller.wants_surface(step):
+                    controller.publish_surface(landscape.get_update())
+                if history is not None and step % every == 0:
+                    history.append(step,step*dt,landscape)
+                if interval > 0 and step % interval == 0:
+                    if history is not None:
+                        # the history must reach every step a run can resume from
+                        history.sync()
+                    landscape.save_checkpoint(directory,step,params=config)
+        finally:
+            if history is not None:
+                history.close()
 
     def create_geoforcing_operator(self,controller: MainController):
         geoparams = controller.get_geology_params()
+        return GeoForcing(**geoparams)
 
     def create_physics_list(self,controller: MainController):
-        return None
+        physics_list = []
+        if controller.geology_params_enabled():
+            physics_list.append(self.create_geoforcing_operator(controller))
+        if controller.waterbot_params_enabled():
+            waterbot = controller.get_waterbot_params()
+            solver   = self.erosion_solvers.get(waterbot.get('Solver'),StreamPowerErosion)
+            physics_list.append(solver(**waterbot))
+        if controller.hillslope_params_enable():
+            physics_list.append(HillslopeCreep(**controller.get_hillslope_params()))
+        return physics_list
 
-    def generate_landscape(self,controller: MainController):
-        simulation = controller.get_simulation_params()
-        return Landscape(simulation)
+    def generate_landscape(self,controller: MainController,simulation=None):
+        if simulation is None:
+            simulation = controller.get_simulation_params()
+        # the surface seed also seeds the run's own random generator
+        seed = controller.get_surface_params().get('seed')
+        return Landscape(simulation,seed=None if seed is None else int(float(seed)))
 
-    def create_initial_surface_operator(self,controller: MainController):
+    def create_initial_surface_operator(self,controller: MainController,simulation=None):
         surface = controller.get_surface_params()
-        simulation = controller.get_simulation_params()
+        if simulation is None:
+            simulation = controller.get_simulation_params()
         return InitialSurface({**surface,**simulation})
 
 
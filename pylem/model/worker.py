@@ -0,0 +1,88 @@
+'''
+Created on Oct 18, 2026
+
+@author: kevinmendoza
+'''
+import threading
+
+
+class LatestValue:
+    # single slot channel between the solver thread and the gui, publishing
+    # overwrites whatever the reader has not taken yet
+    def __init__(self):
+        self._lock  = threading.Lock()
+        self._value = None
+        self._fresh = False
+
+    def publish(self,value):
+        with self._lock:
+            self._value = value
+            self._fresh = True
+
+    def take(self):
+        with self._lock:
+            if not self._fresh:
+                return None
+            value       = self._value
+            self._value = None
+            self._fresh = False
+            return value
+
+    def is_empty(self):
+        return not self._fresh
+
+class SimulationControl:
+
+    def __init__(self):
+        self._running   = threading.Event()
+        self._cancelled = threading.Event()
+        self._running.set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()
+
+    def is_paused(self):
+        return not self._running.is_set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def proceed(self):
+        # blocks while paused, False once the run should stop
+        self._running.wait()
+        return not self._cancelled.is_set()
+
+class SimulationWorker(threading.Thread):
+    # errors, a LatestValue, receives any exception the function raises so
+    # the gui can report it, without one it is raised on the thread as usual
+    def __init__(self,function,*args,errors=None,**kwargs):
+        super().__init__(daemon=True)
+        self.control  = SimulationControl()
+        self.function = function
+        self.args     = args
+        self.kwargs   = kwargs
+        self.errors   = errors
+
+    def run(self):
+        try:
+            self.function(*self.args,control=self.control,**self.kwargs)
+        except Exception as error:
+            if self.errors is None:
+                raise
+            self.errors.publish(error)
+
+    def pause(self):
+        self.control.pause()
+
+    def resume(self):
+        self.control.resume()
+
+    def cancel(self):
+        self.control.cancel()
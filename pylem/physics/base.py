@@ -15,18 +15,27 @@ class GeoMatrix:
     def add_elevation(self,ix,iy,z):
         raise NotImplementedError('please implement the \'add elevation\' method')
 
+    def add_elevation_matrix(self,z,mask=None):
+        raise NotImplementedError('please implement the \'add elevation matrix\' method')
+
     def set_sediment(self,ix,iy,**kwargs):
         raise NotImplementedError('please implement the \'set sediment\' method')
 
     def add_sediment(self,ix,iy,**kwargs):
         raise NotImplementedError('please implement the \'add sediment\' method')
 
+    def change_surface_matrix(self,dz):
+        raise NotImplementedError('please implement the \'change surface matrix\' method')
+
     def get_sediment(self,ix,iy,**kwargs):
         raise NotImplementedError('please implement the \'get sediment\' method')
 
     def get_elevation(self,ix,iy):
         raise NotImplementedError('please implement the \'get elevation\' method')
 
+    def set_elevation_matrix(self,z):
+        raise NotImplementedError('please implement the \'set elevation matrix\' method')
+
     def get_elevation_matrix(self):
         raise NotImplementedError('please implement the \'get elevation matrix\' method')
 
@@ -39,6 +48,12 @@ class GeoMatrix:
     def get_steepest_cell_neighbor(self,x,y,return_gradient=False,**kwargs):
         raise NotImplementedError('please implement the \'get steepest cell neighbor\' method')
 
+    def get_flow_receivers(self,fill_depressions=False):
+        raise NotImplementedError('please implement the \'get flow receivers\' method')
+
+    def get_depressions(self):
+        raise NotImplementedError('please implement the \'get depressions\' method')
+
 class GeoSetting:
 
     def __init__(self,**kwargs):
@@ -57,3 +72,10 @@ class GeoFunction(GeoSetting):
     def simulate(self, ix: int, iy: int, matrix :GeoMatrix,x=0,y=0,**kwargs):
         pass
 
+    def supports_grid(self):
+        # functions able to act on the whole grid at once override this
+        return False
+
+    def simulate_grid(self, matrix: GeoMatrix, xs, ys, **kwargs):
+        raise NotImplementedError('please implement the \'simulate grid\' method')
+
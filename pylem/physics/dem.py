@@ -0,0 +1,164 @@
+'''
+Created on Oct 18, 2026
+
+@author: kevinmendoza
+'''
+import hashlib
+import os
+import tempfile
+import numpy as np
+
+# Digital elevation models are opened as memory maps and only the cells the
+# landscape grid actually samples are ever read. Row 0 of a DEM is taken as
+# y = 0 and column 0 as x = 0, both growing with the array index, which is
+# the same layout as the landscape's own (rows, columns) grid.
+
+formats = ['auto','npy','asc','tif','raw']
+
+# converted text grids, kept out of the user's data directories
+cache_directory = os.path.join(tempfile.gettempdir(),'pylem-dem-cache')
+
+
+class DEM:
+    # a 2d (rows, columns) array-like plus its pixel size and no data value
+    def __init__(self,array,cell_width=None,nodata=None):
+        self.array      = array
+        self.cell_width = cell_width
+        self.nodata     = nodata
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+def guess_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npy':
+        return 'npy'
+    if extension in ('.asc','.grd'):
+        return 'asc'
+    if extension in ('.tif','.tiff'):
+        return 'tif'
+    return 'raw'
+
+def open_dem(path,format='auto',rows=None,columns=None,dtype='float32',offset=0):
+    if format == 'auto':
+        format = guess_format(path)
+    if format == 'npy':
+        return DEM(np.load(path,mmap_mode='r'))
+    if format == 'asc':
+        return open_ascii_grid(path)
+    if format == 'tif':
+        return open_geotiff(path)
+    if format == 'raw':
+        if not rows or not columns:
+            raise ValueError('raw DEMs need their rows and columns')
+        return DEM(np.memmap(path,dtype=np.dtype(dtype),mode='r',offset=int(offset),
+                             shape=(int(rows),int(columns))))
+    raise ValueError('unknown DEM format {0}, expected one of {1}'.format(format,formats))
+
+def read_ascii_header(stream):
+    header = {}
+    while True:
+        position = stream.tell()
+        line     = stream.readline()
+        parts    = line.split()
+        if len(parts) != 2 or not parts[0][0].isalpha():
+            stream.seek(position)
+            return header
+        header[parts[0].lower()] = float(parts[1])
+
+def cache_path(path):
+    # one cache file per source path, named so that it can still be recognised
+    digest = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_directory,'{0}-{1}.npy'.format(os.path.basename(path),digest))
+
+def open_ascii_grid(path):
+    # Text can not be memory mapped, the grid is converted row by row into
+    # a .npy file in cache_directory once and memory mapped from there on.
+    with open(path) as stream:
+        header = read_ascii_header(stream)
+        shape  = (int(header['nrows']),int(header['ncols']))
+        cache  = cache_path(path)
+        if not os.path.exists(cache) or os.path.getmtime(cache) < os.path.getmtime(path):
+            os.makedirs(cache_directory,exist_ok=True)
+            temporary = '{0}.{1}.tmp'.format(cache,os.getpid())
+            try:
+                convert_ascii_rows(stream,path,shape,temporary)
+                os.replace(temporary,cache)
+            finally:
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+    return DEM(np.load(cache,mmap_mode='r'),cell_width=header.get('cellsize'),
+               nodata=header.get('nodata_value'))
+
+def convert_ascii_rows(stream,path,shape,target_path):
+    target = np.lib.format.open_memmap(target_path,mode='w+',dtype=np.float32,shape=shape)
+    try:
+        row    = 0
+        values = []
+        for line in stream:
+            values.extend(line.split())
+            while len(values) >= shape[1]:
+                if row == shape[0]:
+                    raise ValueError('{0} holds more than {1} rows'.format(path,shape[0]))
+                target[row] = np.asarray(values[:shape[1]],dtype=np.float32)
+                values      = values[shape[1]:]
+                row        += 1
+        if row != shape[0]:
+            raise ValueError('{0} holds {1} of {2} rows'.format(path,row,shape[0]))
+        target.flush()
+    finally:
+        del target
+
+def open_geotiff(path):
+    try:
+        import tifffile
+    except ImportError:
+        raise ImportError('reading GeoTIFF DEMs requires the tifffile package')
+    with tifffile.TiffFile(path) as tif:
+        tags       = tif.pages[0].tags
+        nodata     = tags['GDAL_NODATA'].value if 'GDAL_NODATA' in tags else None
+        scale      = tags['ModelPixelScaleTag'].value if 'ModelPixelScaleTag' in tags else None
+    try:
+        # uncompressed, contiguous files are mapped directly
+        array = tifffile.memmap(path,mode='r')
+    except ValueError:
+        array = tifffile.imread(path,out='memmap')
+    return DEM(array,cell_width=float(scale[0]) if scale else None,
+               nodata=float(nodata) if nodata is not None else None)
+
+def resample(dem,xs,ys,cell_width=1.0,x_offset=0.0,y_offset=0.0,block=256):
+    # Bilinear resampling of the DEM onto the landscape grid. The landscape
+    # keeps y along its rows and x along its columns, so xs (axis 0) indexes
+    # DEM rows and ys (axis 1) DEM columns, and a DEM matching the grid comes
+    # back unchanged. Blocks of target rows are filled at a time, each reading
+    # only the DEM cells it interpolates between, so memory stays bounded by
+    # the block size no matter how large the DEM is. Points outside the DEM
+    # take the edge value, no data cells take the lowest valid elevation.
+    rows, columns = dem.shape
+    row           = np.clip((np.asarray(xs,dtype=np.float64) + y_offset)/cell_width,0,rows-1)
+    column        = np.clip((np.asarray(ys,dtype=np.float64) + x_offset)/cell_width,0,columns-1)
+    r0            = np.minimum(np.floor(row).astype(np.intp),max(rows-2,0))
+    c0            = np.minimum(np.floor(column).astype(np.intp),max(columns-2,0))
+    r1, c1        = np.minimum(r0+1,rows-1), np.minimum(c0+1,columns-1)
+    wr, wc        = row - r0, column - c0
+    wr[r1 == r0]  = 0
+    wc[c1 == c0]  = 0
+
+    result = np.empty((row.shape[0],column.shape[0]),dtype=np.float64)
+    for start in range(0,row.shape[0],block):
+        part    = slice(start,start+block)
+        # dem[ix_(r, c)] on a memory map only pages in the sampled cells
+        corners = [np.asarray(dem.array[np.ix_(r,c)],dtype=np.float64)
+                   for r in (r0[part],r1[part]) for c in (c0,c1)]
+        if dem.nodata is not None:
+            for corner in corners:
+                corner[corner == dem.nodata] = np.nan
+        top    = corners[0]*(1-wc[None,:]) + corners[1]*wc[None,:]
+        bottom = corners[2]*(1-wc[None,:]) + corners[3]*wc[None,:]
+        result[part] = top*(1-wr[part,None]) + bottom*wr[part,None]
+
+    missing = np.isnan(result)
+    if missing.any():
+        result[missing] = np.nanmin(result) if not missing.all() else 0
+    return result
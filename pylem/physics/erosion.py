@@ -3,24 +3,129 @@ Created on Oct 4, 2018
 
 @author: kevinmendoza
 '''
-from pylem.physics.base import GeoFunction
+from pylem.physics.base import GeoFunction, GeoMatrix
+from pylem.physics.flow import topological_levels, accumulate, d8_offsets, d8_distance
+from pylem.physics import kernels
 import numpy as np
     
 class HillslopeCreep(GeoFunction):
+    # Linear diffusion of the surface with Gradient Constant as diffusivity.
+    # Links to the nan pad carry no flux, so the domain edge is closed.
+    modes    = ['explicit','implicit']
+    stencils = {
+        '5-point': np.asarray([0,1,0,1,1,0,1,0],dtype=np.float64),
+        '9-point': np.asarray([1,4,1,4,4,1,4,1],dtype=np.float64)/6.0,
+    }
+    cfl = 0.9
+
     def __init__(self,**kwargs):
         super().__init__()
-        self.c =float(kwargs['Gradient Constant'])
-        
-    def simulate(self, ix, iy, matrix):
-        dx, dy=matrix.get_gradient_at(ix, iy)
-        gradient =node.get_gradient()
-        if gradient <= 0:
-                new_node=node.get_lowest_node()
-                sediment_to_move = np.abs(gradient)*self.c
-                new_node.z+=sediment_to_move
-                node.z-=sediment_to_move
-        
-    
+        self.c       = float(kwargs.get('Gradient Constant',1.0))
+        self.mode    = kwargs.get('Mode','explicit')
+        self.stencil = kwargs.get('Stencil','5-point')
+        self.weights = self.stencils.get(self.stencil,self.stencils['5-point'])
+
+    def supports_grid(self):
+        return True
+
+    def simulate_grid(self, matrix: GeoMatrix, xs, ys, dt=1.0, **kwargs):
+        dxy       = matrix._dxy
+        # substeps and banded solves accumulate in float64 whatever the storage
+        elevation = np.asarray(matrix.get_elevation_matrix(),dtype=np.float64)
+        if self.mode == 'implicit' and not np.isnan(elevation).any():
+            new_elevation = self.implicit(elevation,dt,dxy)
+        else:
+            new_elevation = self.explicit(elevation,dt,dxy)
+        matrix.change_surface_matrix(new_elevation - elevation)
+
+    def stable_time_step(self,dxy):
+        return self.cfl*dxy*dxy / (self.c*np.sum(self.weights))
+
+    def explicit(self,elevation,dt,dxy):
+        if self.c <= 0:
+            return elevation
+        substeps = int(np.ceil(dt / self.stable_time_step(dxy)))
+        sub_dt   = dt / substeps
+        shape    = elevation.shape
+        padded   = np.pad(elevation,(1,1),'constant',constant_values=(np.nan,np.nan))
+        center   = padded[1:-1,1:-1]
+        scratch  = np.empty(shape)
+        flux     = np.empty(shape)
+        for step in range(0,substeps):
+            flux.fill(0)
+            for k, (di, dj) in enumerate(d8_offsets):
+                if self.weights[k] == 0:
+                    continue
+                np.subtract(padded[1+di:1+di+shape[0],1+dj:1+dj+shape[1]],center,out=scratch)
+                np.nan_to_num(scratch,copy=False,nan=0.0)
+                scratch*= self.weights[k]
+                flux   += scratch
+            flux  *= self.c*sub_dt/(dxy*dxy)
+            center+= flux
+        return center.copy()
+
+    def implicit(self,elevation,dt,dxy):
+        # backward Euler, stable for any dt. The 5-point stencil is split into
+        # x then y sweeps, each a batch of tridiagonal solves sharing one
+        # matrix, the 9-point stencil with its diagonal links is solved whole
+        r = self.c*dt/(dxy*dxy)
+        if self.weights[0] > 0:
+            return self._implicit_solve(elevation,r)
+        z = self._implicit_sweep(elevation,r)
+        z = self._implicit_sweep(z.T,r).T
+        return z
+
+    def _implicit_sweep(self,z,r):
+        from scipy import linalg
+        n  = z.shape[0]
+        if n < 2:
+            return z.copy()
+        ab = np.empty((3,n))
+        ab[0,:]  = -r
+        ab[2,:]  = -r
+        ab[1,:]  = 1 + 2*r
+        ab[1,0]  = ab[1,-1] = 1 + r
+        return linalg.solve_banded((1,1),ab,z)
+
+    def _implicit_solve(self,z,r):
+        # diagonal links do not split into x and y sweeps, the whole backward
+        # Euler system is symmetric positive definite and solved with
+        # conjugate gradients starting from the current surface
+        from scipy.sparse.linalg import cg
+        flat     = z.ravel()
+        solution, info = cg(self._implicit_operator(z.shape,r),flat,x0=flat,rtol=1e-12,atol=0.0)
+        if info != 0:
+            raise RuntimeError('implicit hillslope creep did not converge')
+        return solution.reshape(z.shape)
+
+    def _implicit_operator(self,shape,r):
+        # I - r*L over the links that stay inside the grid, rebuilt only when
+        # the grid or the time step change
+        if getattr(self,'_operator_key',None) == (shape,r):
+            return self._operator
+        from scipy import sparse
+        index    = np.arange(shape[0]*shape[1]).reshape(shape)
+        rows     = []
+        columns  = []
+        values   = []
+        diagonal = np.ones(index.size)
+        for k, (di, dj) in enumerate(d8_offsets):
+            if self.weights[k] == 0:
+                continue
+            source = index[max(0,-di):shape[0]-max(0,di),max(0,-dj):shape[1]-max(0,dj)].ravel()
+            target = index[max(0,di):shape[0]+min(0,di),max(0,dj):shape[1]+min(0,dj)].ravel()
+            rows.append(source)
+            columns.append(target)
+            values.append(np.full(source.size,-r*self.weights[k]))
+            np.add.at(diagonal,source,r*self.weights[k])
+        rows.append(index.ravel())
+        columns.append(index.ravel())
+        values.append(diagonal)
+        self._operator     = sparse.csr_matrix((np.concatenate(values),(np.concatenate(rows),np.concatenate(columns))),
+                                               shape=(index.size,index.size))
+        self._operator_key = (shape,r)
+        return self._operator
+
 class _WaterBot_():
     
     def __init__(self):
@@ -32,35 +137,51 @@ class _WaterBot_():
     def should_terminate(self):
         return self.iterations > self.max_iterations
                     
-class WaterBotSimulate():
+class WaterBotSimulate(GeoFunction):
     max_iterations = 100
+    compiled       = True
+    default_dict = {
+        'Gradient Constant'   : 1.0,
+        'Exponential Law'     : 1.0,
+        'Gradient Offset'     : 0.0,
+        'Base Offset'         : 0.0,
+        'Sediment Discharge %': 10.0,
+    }
     def __init__(self,*args,**kwargs):
-        self.constants = {}
+        super().__init__()
+        self.constants = {**self.default_dict}
         for key in kwargs.keys():
-            self.constants[key]=float(kwargs[key])
+            try:
+                self.constants[key]=float(kwargs[key])
+            except (TypeError, ValueError):
+                pass
  
-    def simulate(self,node,**kwargs):
-        waterbot = _WaterBot_()
-        kwargs['controller']=waterbot
-        for iteration in range(0,self.max_iterations):
-            kwargs['gradient']= node.get_gradient()
-            if kwargs['gradient'] <= 0:
-                self.river_running(node=node,**kwargs)
-                node = node.get_lowest_node()
-            else:
-                self.lake_filling(node=node,**kwargs)
-    
-    def river_running(self,node=None,**kwargs):
-        sedimentation_potential   = self.get_deposit_potential(**kwargs)
-        elevation_change          = self.change_sediment(sedimentation_potential,**kwargs)
-        node.z                   += elevation_change
-                
-    def lake_filling(self,node=None,**kwargs):
-        d_sediment = kwargs['controller'].sediment*0.3
-        if d_sediment > 1e-4:
-            node.z+= d_sediment
-            kwargs['controller'].sediment-=d_sediment
-                
+    def supports_grid(self):
+        return True
+
+    def simulate(self, ix, iy, matrix: GeoMatrix, dt=1.0, **kwargs):
+        start = np.asarray([ix*matrix.shape[1] + iy],dtype=np.intp)
+        self.release_waterbots(matrix,start,dt=dt)
+
+    def simulate_grid(self, matrix: GeoMatrix, xs, ys, dt=1.0, **kwargs):
+        # one bot per cell, released in random order drawn from the landscape's generator
+        random = kwargs.get('random',np.random)
+        order  = random.permutation(xs.shape[0]*ys.shape[0])
+        self.release_waterbots(matrix,order,dt=dt)
+
+    def release_waterbots(self,matrix: GeoMatrix,order,dt=1.0):
+        dxy         = matrix._dxy
+        depressions = matrix.get_depressions()
+        elevation   = matrix._get_elevation()
+        walk = kernels.walk_waterbots if self.compiled else kernels.python_walk_waterbots
+        walk(matrix._bedrock_map,matrix._sediment_map,elevation,
+                       depressions.depth.copy(),depressions.spill,order,
+                       d8_offsets,d8_distance*dxy,
+                       self.constants['Gradient Constant'],self.constants['Exponential Law'],
+                       self.constants['Gradient Offset'],self.constants['Base Offset'],
+                       self.constants['Sediment Discharge %'] / 100.0,dt,self.max_iterations)
+        matrix.mark_dirty()
+
     def change_sediment(self,sedimentation_potential,waterbot=None,**kwargs):
         # if sedimentation potential is negative, it wants a lot of sediment
         # if sedimentation potential is positive, it needs to get rid of sediment
@@ -93,3 +214,117 @@ class WaterBotSimulate():
         
         gradient = np.abs(gradient)+ grad_offset
         return grad_const * np.power(gradient,exponent) + base_offset
+
+
+class StreamPowerErosion(WaterBotSimulate):
+    # Grid-wide version of the waterbot transport law. Drainage area comes
+    # from the D8 receiver graph and stands in for the number of bots that
+    # pass through a cell, so the carrying capacity of a cell is the expected
+    # load of one bot times its upstream cell count. Sediment flux is then
+    # routed downstream one topological level at a time. Depressions are
+    # filled for routing, lakes trap sediment up to their depth and pass the
+    # rest on towards their spill point.
+
+    def supports_grid(self):
+        return True
+
+    def simulate_grid(self, matrix: GeoMatrix, xs, ys, dt=1.0, **kwargs):
+        shape               = (xs.shape[0],ys.shape[0])
+        receivers, gradient = matrix.get_flow_receivers(fill_depressions=True)
+        lake_depth          = matrix.get_depressions().depth
+        levels              = topological_levels(receivers)
+        area                = accumulate(levels,receivers,np.ones(receivers.shape[0]))
+        capacity            = dt*area*self.calculate_expected_load(gradient=gradient.astype(np.float64))
+        elevation           = np.asarray(matrix.get_elevation_matrix(),dtype=np.float64).ravel()
+        # eroding a cell below its receiver would reverse the flow direction
+        max_erosion         = np.maximum(elevation - elevation[receivers],0)
+        dz                  = self.route_sediment(levels,receivers,capacity,max_erosion,lake_depth)
+        matrix.change_surface_matrix(dz.reshape(shape))
+
+    def route_sediment(self,levels,receivers,capacity,max_erosion,lake_depth):
+        sed_disch = self.constants['Sediment Discharge %'] / 100.0
+        flux      = np.zeros(receivers.shape[0])
+        dz        = np.zeros(receivers.shape[0])
+        for level in levels:
+            sediment  = flux[level]
+            potential = sediment - capacity[level]
+            # same three cases as change_sediment, one level at a time
+            change = np.where(potential > sediment, sediment*sed_disch,
+                     np.where(potential > 0, potential*sed_disch,
+                              np.maximum(potential,-max_erosion[level])))
+            # lakes settle what they can hold, the rest heads for the spill
+            depth   = lake_depth[level]
+            change  = np.where(depth > 0,np.minimum(sediment,depth),change)
+            carried = sediment - change
+            # cells draining to themselves are outlets and export their load
+            flowing = receivers[level] != level
+            np.add.at(flux,receivers[level[flowing]],carried[flowing])
+            dz[level] = change
+        return dz
+
+
+class ImplicitStreamPower(WaterBotSimulate):
+    # Braun & Willett (2013) implicit fluvial incision. Cells are solved
+    # receivers first, so every receiver already holds its new elevation and
+    # each update only depends on one unknown, which keeps the scheme stable
+    # for large time steps. Gradient Constant is the erodibility, Exponential
+    # Law the slope exponent and Gradient Offset is added to the slope as in
+    # calculate_expected_load. The law is detachment limited, so Base Offset
+    # and Sediment Discharge % do not apply.
+    area_exponent     = 0.5
+    newton_iterations = 20
+    tolerance         = 1e-10
+    min_slope         = 1e-12 # keeps slope^(n-1) finite for n < 1
+
+    def supports_grid(self):
+        return True
+
+    def simulate_grid(self, matrix: GeoMatrix, xs, ys, dt=1.0, **kwargs):
+        shape               = (xs.shape[0],ys.shape[0])
+        dxy                 = matrix._dxy
+        receivers, gradient = matrix.get_flow_receivers(fill_depressions=True)
+        levels              = topological_levels(receivers)
+        area                = accumulate(levels,receivers,np.ones(receivers.shape[0]))
+        elevation           = np.asarray(matrix.get_elevation_matrix(),dtype=np.float64).ravel()
+        length              = self.receiver_distance(receivers,shape,dxy)
+        factor              = dt*self.constants['Gradient Constant']*np.power(area,self.area_exponent)
+        new_elevation       = self.solve(levels,receivers,elevation,factor,length)
+        matrix.change_surface_matrix((new_elevation - elevation).reshape(shape))
+
+    def receiver_distance(self,receivers,shape,dxy):
+        index  = np.arange(receivers.shape[0])
+        di     = receivers // shape[1] - index // shape[1]
+        dj     = receivers %  shape[1] - index %  shape[1]
+        return np.sqrt(di*di + dj*dj)*dxy
+
+    def solve(self,levels,receivers,elevation,factor,length):
+        exponent = self.constants['Exponential Law']
+        offset   = self.constants['Gradient Offset']
+        z        = elevation.copy()
+        for level in reversed(levels):
+            active = level[receivers[level] != level]
+            if active.shape[0] == 0:
+                continue
+            z0 = elevation[active]
+            zr = z[receivers[active]]
+            f  = factor[active]
+            dx = length[active]
+            if exponent == 1.0:
+                new_z = (z0 + f/dx*zr - f*offset) / (1.0 + f/dx)
+            else:
+                new_z = self.newton(z0,zr,f,dx,exponent,offset)
+            z[active] = np.minimum(np.maximum(new_z,zr),z0)
+        return z
+
+    def newton(self,z0,zr,factor,length,exponent,offset):
+        # root of z - z0 + factor*((z - zr)/length + offset)^n with zr <= z <= z0
+        z = z0.copy()
+        for iteration in range(0,self.newton_iterations):
+            slope    = np.maximum((z - zr)/length + offset,0)
+            residual = z - z0 + factor*np.power(slope,exponent)
+            slope_n1 = np.power(np.maximum(slope,self.min_slope),exponent-1)
+            step     = residual / (1.0 + factor*exponent/length*slope_n1)
+            z        = np.clip(z - step,zr,z0)
+            if np.max(np.abs(step)) < self.tolerance:
+                break
+        return z
@@ -0,0 +1,102 @@
+'''
+Created on Oct 18, 2026
+
+@author: kevinmendoza
+'''
+import numpy as np
+from pylem.physics import kernels
+
+# neighbour offsets in the row-major order of a 3x3 window, center excluded
+d8_offsets  = np.asarray([[-1,-1],[-1,0],[-1,1],
+                          [ 0,-1],       [ 0,1],
+                          [ 1,-1],[ 1,0],[ 1,1]],dtype=np.intp)
+d8_distance = np.sqrt(np.sum(d8_offsets**2,axis=1))
+
+
+def topological_levels(receivers):
+    # Kahn's algorithm run a whole frontier at a time. Every level only holds
+    # cells whose donors all sit in earlier levels, so a level can be updated
+    # with one vectorized operation, upstream levels first.
+    n        = receivers.shape[0]
+    index    = np.arange(n)
+    flowing  = receivers != index
+    donors   = np.bincount(receivers[flowing],minlength=n)
+    frontier = index[donors == 0]
+    levels   = []
+    while frontier.shape[0] > 0:
+        levels.append(frontier)
+        targets, counts = np.unique(receivers[frontier[flowing[frontier]]],return_counts=True)
+        donors[targets]-= counts
+        frontier = targets[donors[targets] == 0]
+    return levels
+
+def build_stack(levels):
+    # upstream to downstream ordering, reverse it to visit receivers first
+    if not levels:
+        return np.zeros(0,dtype=np.intp)
+    return np.concatenate(levels)
+
+def accumulate(levels,receivers,weights):
+    total = np.array(weights,dtype=np.float64)
+    for level in levels:
+        moving = level[receivers[level] != level]
+        np.add.at(total,receivers[moving],total[moving])
+    return total
+
+class Depressions:
+    # filled surface, lake depth, spill cell of every lake cell (-1 outside
+    # lakes) and the receivers of the flood, all flat over the grid
+    def __init__(self,filled,depth,spill,receivers):
+        self.filled    = filled
+        self.depth     = depth
+        self.spill     = spill
+        self.receivers = receivers
+
+    def in_lake(self):
+        return self.depth > 0
+
+def priority_flood(elevation):
+    # Priority-Flood+ (Barnes et al. 2014). Cells touching the nan pad seed
+    # the queue, the lowest open cell is expanded first and neighbours that
+    # sit below the water level are raised onto it through a plain FIFO,
+    # so only cells above the water level pay for the heap. The queue loop
+    # itself lives in kernels.flood_fill.
+    shape   = elevation.shape
+    columns = shape[1]+2
+    padded  = np.pad(elevation,(1,1),'constant',constant_values=(np.nan,np.nan))
+    z       = padded.ravel()
+    closed  = np.isnan(z)
+    seeds   = np.zeros(padded.shape,dtype=bool)
+    for di, dj in d8_offsets:
+        seeds[1:-1,1:-1]|= np.isnan(padded[1+di:1+di+shape[0],1+dj:1+dj+shape[1]])
+    seeds   = np.flatnonzero(seeds & ~np.isnan(padded))
+
+    filled    = z.copy()
+    receivers = np.arange(z.shape[0])
+    spill     = np.full(z.shape[0],-1,dtype=np.intp)
+    offsets   = (d8_offsets[:,0]*columns + d8_offsets[:,1]).astype(np.intp)
+    if seeds.shape[0] > 0:
+        kernels.flood_fill(z,closed,seeds.astype(np.intp),offsets,filled,receivers,spill)
+
+    interior  = np.arange(z.shape[0]).reshape(padded.shape)[1:-1,1:-1].ravel()
+    to_grid   = np.full(z.shape[0],-1,dtype=np.intp)
+    to_grid[interior] = np.arange(interior.shape[0])
+    filled    = filled[interior]
+    depth     = np.nan_to_num(filled - z[interior])
+    spill     = np.where((depth > 0) & (spill[interior] >= 0),to_grid[spill[interior]],-1)
+    receivers = to_grid[receivers[interior]]
+    return Depressions(filled,depth,spill,receivers)
+
+def route_over_depressions(steepest,gradient,depressions,shape,dxy=1.0):
+    # steepest descent wherever it strictly lowers the filled surface, the
+    # flood receivers across lakes and flats, which keeps the graph acyclic
+    filled    = depressions.filled
+    index     = np.arange(filled.shape[0])
+    descends  = (gradient < 0) & (filled[steepest] < filled)
+    receivers = np.where(descends,steepest,depressions.receivers)
+    di        = receivers // shape[1] - index // shape[1]
+    dj        = receivers %  shape[1] - index %  shape[1]
+    length    = np.sqrt(di*di + dj*dj)*dxy
+    length[receivers == index] = 1
+    routed    = np.minimum((filled[receivers] - filled) / length,0)
+    return receivers, np.nan_to_num(routed)
@@ -0,0 +1,126 @@
+'''
+Created on Oct 18, 2026
+
+@author: kevinmendoza
+'''
+import heapq
+import numpy as np
+
+# Sequential per-cell loops over plain arrays and scalars. When numba is
+# installed they are compiled, otherwise the same functions run as python,
+# so both backends give the same results. Compilation, and the numba import
+# itself, wait for the first call so importing pylem stays cheap.
+
+
+def jit(function):
+    compiled = []
+    def kernel(*args):
+        if not compiled:
+            compiled.append(_compile(function))
+        return compiled[0](*args)
+    return kernel
+
+def _compile(function):
+    try:
+        import numba
+    except ImportError:
+        return function
+    return numba.njit(cache=True)(function)
+
+def _walk_waterbots(bedrock,sediment,elevation,lake_depth,spill,order,offsets,distance,
+                    grad_const,exponent,grad_offset,base_offset,sed_disch,dt,max_iterations):
+    # Walks the bots one after the other over the nan padded maps, so every
+    # bot sees the surface left by the previous ones.
+    columns = elevation.shape[1] - 2
+    for start in order:
+        load = 0.0
+        node = start
+        for iteration in range(0,max_iterations):
+            ix = node // columns + 1
+            iy = node %  columns + 1
+            if lake_depth[node] > 0:
+                # lake filling: settle what the lake can still hold and carry
+                # the rest over its spill point
+                settled = min(load,lake_depth[node])
+                sediment[ix,iy]  += settled
+                elevation[ix,iy] += settled
+                lake_depth[node] -= settled
+                load             -= settled
+                node              = spill[node]
+                continue
+
+            gradient = np.inf
+            target   = -1
+            boundary = False
+            for k in range(0,8):
+                neighbor = elevation[ix+offsets[k,0],iy+offsets[k,1]]
+                if np.isnan(neighbor):
+                    boundary = True
+                    continue
+                slope = (neighbor - elevation[ix,iy]) / distance[k]
+                if slope < gradient:
+                    gradient = slope
+                    target   = k
+            if target < 0 or gradient > 0:
+                # a pit raised during this step keeps the load, the edge exports it
+                if not boundary:
+                    sediment[ix,iy]  += load
+                    elevation[ix,iy] += load
+                break
+
+            # river running, see change_sediment
+            expected  = dt*(grad_const*(abs(gradient) + grad_offset)**exponent + base_offset)
+            potential = load - expected
+            if potential > load:
+                change = load*sed_disch
+            elif potential > 0:
+                change = potential*sed_disch
+            else:
+                change = potential
+            load -= change
+            sediment[ix,iy]  += change
+            elevation[ix,iy] += change
+            if sediment[ix,iy] < 0:
+                bedrock[ix,iy] += sediment[ix,iy]
+                sediment[ix,iy] = 0.0
+            node = (ix + offsets[target,0] - 1)*columns + iy + offsets[target,1] - 1
+
+def _flood_fill(z,closed,seeds,offsets,filled,receivers,spill):
+    # the queue loop of priority_flood, see pylem.physics.flow
+    pit      = np.empty(z.shape[0],dtype=np.intp)
+    pit_head = 0
+    pit_tail = 0
+    heap     = [(z[seeds[0]],seeds[0])]
+    for i in range(1,seeds.shape[0]):
+        heap.append((z[seeds[i]],seeds[i]))
+    heapq.heapify(heap)
+    for i in range(0,seeds.shape[0]):
+        closed[seeds[i]] = True
+
+    while len(heap) > 0 or pit_head < pit_tail:
+        if pit_head < pit_tail:
+            cell      = pit[pit_head]
+            pit_head += 1
+        else:
+            cell = heapq.heappop(heap)[1]
+        level = filled[cell]
+        for offset in offsets:
+            neighbor = cell + offset
+            if closed[neighbor]:
+                continue
+            closed[neighbor]    = True
+            receivers[neighbor] = cell
+            if z[neighbor] <= level:
+                # under water, drains through the same spill as its source
+                filled[neighbor] = level
+                spill[neighbor]  = spill[cell] if spill[cell] >= 0 else cell
+                pit[pit_tail]    = neighbor
+                pit_tail        += 1
+            else:
+                heapq.heappush(heap,(z[neighbor],neighbor))
+
+
+python_walk_waterbots = _walk_waterbots
+python_flood_fill     = _flood_fill
+walk_waterbots        = jit(_walk_waterbots)
+flood_fill            = jit(_flood_fill)
@@ -6,8 +6,12 @@ Created on Tue Sep 25 11:10:19 2018
 @author: kevinmendoza
 """
 
+import json
+import os
+import shutil
 import numpy as np
 from pylem.physics.base import GeoSetting, GeoMatrix
+from pylem.physics.flow import d8_offsets, d8_distance, priority_flood, route_over_depressions
 
 
 def _reduce_nan_matrix(nan_matrix):
@@ -15,33 +19,130 @@ def _reduce_nan_matrix(nan_matrix):
     matrix    = nan_matrix[1:shape[0]-1,1:shape[1]-1]
     return matrix
 
-class _LandscapeMatrix(GeoMatrix):
-    _dxy_mask = np.asarray([[np.sqrt(2), 1 ,np.sqrt(2)],
-                            [1,          0, 1         ],
-                            [np.sqrt(2), 1, np.sqrt(2)]])
+def _d8_steepest(elevation,dxy=1.0):
+    # one pass over the 8 shifted views of the nan padded elevation array
+    shape     = (elevation.shape[0]-2,elevation.shape[1]-2)
+    center    = _reduce_nan_matrix(elevation)
+    gradient  = np.full(shape,np.inf,dtype=elevation.dtype)
+    direction = np.full(shape,-1,dtype=np.int8)
+    scratch   = np.empty(shape,dtype=elevation.dtype)
+    steeper   = np.empty(shape,dtype=bool)
+    for k, (di, dj) in enumerate(d8_offsets):
+        neighbor = elevation[1+di:1+di+shape[0],1+dj:1+dj+shape[1]]
+        np.subtract(neighbor,center,out=scratch)
+        np.divide(scratch,d8_distance[k]*dxy,out=scratch)
+        # nan neighbours compare False and are never chosen
+        np.less(scratch,gradient,out=steeper)
+        np.copyto(gradient,scratch,where=steeper)
+        np.copyto(direction,k,where=steeper)
+
+    index    = np.arange(shape[0]*shape[1]).reshape(shape)
+    no_exit  = direction < 0
+    shift    = d8_offsets[direction.ravel()].reshape(shape+(2,))
+    steepest = index + shift[:,:,0]*shape[1] + shift[:,:,1]
+    steepest[no_exit] = index[no_exit]
+    gradient[no_exit] = 0
+    return steepest.ravel(), gradient.ravel()
 
-    _mask_3  = np.arange(0,3,1)
+class _LandscapeMatrix(GeoMatrix):
 
-    _ones  = np.ones((1,2),dtype=np.int16)
-    def __init__(self,shape=(100,100)):
+    def __init__(self,shape=(100,100),dxy=1.0,maps=None,dtype=np.float64):
+        # dtype is the storage of the three maps; the processes accumulate
+        # in float64 and only their results are rounded into it
         super().__init__()
-        self._bedrock_map    = np.pad(np.zeros(shape), (1,1),'constant',constant_values=(np.nan,np.nan))
-        self._sediment_map   = np.pad(np.zeros(shape), (1,1),'constant',constant_values=(np.nan,np.nan))
+        self.shape           = tuple(shape)
+        self._dxy            = dxy
+        if maps is None:
+            self.dtype           = np.dtype(dtype)
+            self._bedrock_map    = np.pad(np.zeros(shape,dtype=self.dtype), (1,1),'constant',constant_values=(np.nan,np.nan))
+            self._sediment_map   = np.pad(np.zeros(shape,dtype=self.dtype), (1,1),'constant',constant_values=(np.nan,np.nan))
+            self._elevation_map  = self._bedrock_map + self._sediment_map
+        else:
+            # padded maps restored as they are, e.g. memory mapped checkpoints.
+            # The elevation buffer is restored too rather than summed again,
+            # it carries the rounding of its incremental updates.
+            self._bedrock_map, self._sediment_map, self._elevation_map = maps
+            self.dtype           = self._bedrock_map.dtype
+        self._dirty_rows     = None
+        self._version        = 0
+        self._d8_version     = -1
+        self._d8             = None
+        self._flood_version  = -1
+        self._flood          = None
+
+    def _elevation_changed(self):
+        # bumps the version all elevation derived caches are keyed on
+        self._version+=1
+
+    def _update_cell(self,ix,iy):
+        self._elevation_map[ix+1,iy+1]=self._bedrock_map[ix+1,iy+1]+self._sediment_map[ix+1,iy+1]
+        self._elevation_changed()
+
+    def mark_dirty(self,rows=None):
+        # for writers going straight to _bedrock_map/_sediment_map,
+        # rows is the (first, last+1) range of interior rows touched
+        if rows is None:
+            rows = (0,self.shape[0])
+        if self._dirty_rows is not None:
+            rows = (min(rows[0],self._dirty_rows[0]),max(rows[1],self._dirty_rows[1]))
+        self._dirty_rows = rows
+        self._elevation_changed()
+
+    def _refresh_elevation(self):
+        if self._dirty_rows is not None:
+            rows = slice(self._dirty_rows[0]+1,self._dirty_rows[1]+1)
+            np.add(self._bedrock_map[rows],self._sediment_map[rows],out=self._elevation_map[rows])
+            self._dirty_rows = None
 
     def set_elevation(self,ix,iy,z):
         self._bedrock_map[ix+1,iy+1]=z
+        self._update_cell(ix,iy)
+
+    def set_elevation_matrix(self,z):
+        _reduce_nan_matrix(self._bedrock_map)[:,:]=z
+        self.mark_dirty()
 
     def add_elevation(self,ix,iy,z):
         self._bedrock_map[ix+1,iy+1]=self._bedrock_map[ix+1,iy+1]+z
+        self._update_cell(ix,iy)
+
+    def add_elevation_matrix(self,z,mask=None):
+        self._refresh_elevation()
+        bedrock   = _reduce_nan_matrix(self._bedrock_map)
+        elevation = _reduce_nan_matrix(self._elevation_map)
+        if mask is None:
+            np.add(bedrock,z,out=bedrock)
+            np.add(elevation,z,out=elevation)
+        else:
+            np.add(bedrock,z,out=bedrock,where=mask)
+            np.add(elevation,z,out=elevation,where=mask)
+        self._elevation_changed()
 
     def set_sediment(self,ix,iy,z=0,**kwargs):
         self._sediment_map[ix+1,iy+1]=z
+        self._update_cell(ix,iy)
 
     def add_sediment(self,ix,iy,z=0,**kwargs):
         self._sediment_map[ix+1,iy+1]=self._sediment_map[ix+1,iy+1]+z
+        self._update_cell(ix,iy)
+
+    def change_surface_matrix(self,dz):
+        # deposition lands on the sediment cover, erosion strips the sediment
+        # first and cuts into bedrock only once the cover is gone
+        self._refresh_elevation()
+        sediment  = _reduce_nan_matrix(self._sediment_map)
+        bedrock   = _reduce_nan_matrix(self._bedrock_map)
+        elevation = _reduce_nan_matrix(self._elevation_map)
+        np.add(sediment,dz,out=sediment)
+        np.add(bedrock,np.minimum(sediment,0),out=bedrock)
+        np.maximum(sediment,0,out=sediment)
+        np.add(elevation,dz,out=elevation)
+        self._elevation_changed()
 
     def _get_elevation(self):
-        return self._bedrock_map + self._sediment_map
+        # persistent bedrock + sediment buffer, do not write through it
+        self._refresh_elevation()
+        return self._elevation_map
 
     def get_sediment(self,ix,iy,**kwargs):
         return self._sediment_map[ix + 1, iy + 1]
@@ -51,7 +152,7 @@ class _LandscapeMatrix(GeoMatrix):
 
     def get_elevation_matrix(self):
         nan_matrix = self._get_elevation()
-        return _reduce_nan_matrix(nan_matrix)
+        return _reduce_nan_matrix(nan_matrix).copy()
 
     def get_bedrock_matrix(self):
         nan_matrix = self._bedrock_map
@@ -61,23 +162,45 @@ class _LandscapeMatrix(GeoMatrix):
         nan_matrix = self._sediment_map
         return _reduce_nan_matrix(nan_matrix)
 
+    def _get_d8(self):
+        if self._d8_version != self._version:
+            steepest, gradient = _d8_steepest(self._get_elevation(),dxy=self._dxy)
+            index     = np.arange(steepest.shape[0])
+            receivers = np.where(gradient < 0,steepest,index)
+            self._d8         = (steepest,receivers,gradient)
+            self._d8_version = self._version
+        return self._d8
+
+    def get_depressions(self):
+        if self._flood_version != self._version:
+            elevation   = _reduce_nan_matrix(self._get_elevation())
+            depressions = priority_flood(elevation)
+            steepest, receivers, gradient = self._get_d8()
+            routed      = route_over_depressions(steepest,gradient,depressions,self.shape,dxy=self._dxy)
+            self._flood         = (depressions,routed)
+            self._flood_version = self._version
+        return self._flood[0]
+
+    def get_flow_receivers(self,fill_depressions=False):
+        # flat receiver index per cell, without filling pits and flats drain
+        # to themselves, with filling they drain across lakes to the edges
+        if fill_depressions:
+            self.get_depressions()
+            return self._flood[1]
+        steepest, receivers, gradient = self._get_d8()
+        return receivers, gradient
+
     def get_steepest_cell_neighbor(self,x,y,return_gradient=False):
-        elevation     = self._get_elevation()
-        arx           = self._mask_3 + x
-        ary           = self._mask_3 + y
-        sub_elevation_matrix = elevation[np.ix_(arx,ary)]
-        normalized_difference = np.divide(sub_elevation_matrix - sub_elevation_matrix[1,1],self._dxy_mask)
-        indices       = np.unravel_index(np.nanargmin(normalized_difference),normalized_difference.shape)
-        local_indices = np.asarray(indices)
-        actual_indices= local_indices - self._ones + np.asarray([x,y])
+        steepest, receivers, gradient = self._get_d8()
+        flat           = x*self.shape[1] + y
+        actual_indices = np.asarray(divmod(steepest[flat],self.shape[1]))
 
         if return_gradient:
-            gradient       = normalized_difference[local_indices[0],local_indices[1]]
-            actual_indices = (actual_indices.ravel(),gradient)
+            return actual_indices, gradient[flat]
+
+        return actual_indices
+
 
-        return actual_indices.ravel()
-        
-            
 class Landscape(GeoSetting):
     default_dict = {
         'X Dimension Extent': 100,
@@ -85,37 +208,75 @@ class Landscape(GeoSetting):
         'Cell Width'  : 10,
     }
 
-    def __init__(self,kwargs):
+    checkpoint_pointer = 'latest.json'
+    checkpoints_kept   = 2
+
+    def __init__(self,kwargs,maps=None,seed=None):
         super().__init__()
         self.required_keys=['X Dimension Extent', 'Y Dimension Extent',
                             'Cell Width']
         self.shape = self.__get_indice_dimensions__(**kwargs)
-        self.matrix = _LandscapeMatrix(shape=self.shape)
+        self.matrix = _LandscapeMatrix(shape=self.shape,dxy=self._dxy,maps=maps,
+                                       dtype=self.get_dtype(kwargs))
+        self.dtype  = self.matrix.dtype
+        self.xs, self.ys = self.get_coordinates()
+        # stochastic processes draw from this generator, never the global one,
+        # so runs only depend on their seed and checkpoints carry its state
+        self.random = np.random.RandomState(seed)
         
     def __get_indice_dimensions__(self, **kwargs):
         if not self.required_keys_exist(**kwargs):
             kwargs = self.default_dict
+        self.dimensions = {key: float(kwargs[key]) for key in self.required_keys}
+        self._dxy       = float(kwargs['Cell Width'])
+        return self.get_shape(kwargs)
 
-        x_extent       = float(kwargs['X Dimension Extent'])
-        y_extent       = float(kwargs['Y Dimension Extent'])
-        self._dxy      = float(kwargs['Cell Width'])
-
-        numx   = int(x_extent / self._dxy)
-        numy   = int(y_extent / self._dxy)
+    @staticmethod
+    def get_dtype(kwargs):
+        # 'Precision' picks the storage of the maps, float32 halves memory
+        return np.dtype(str(kwargs.get('Precision','float64')))
 
+    @classmethod
+    def get_shape(cls,kwargs):
+        # grid size without allocating it, e.g. to estimate the cost first
+        if not all(key in kwargs for key in ('X Dimension Extent','Y Dimension Extent','Cell Width')):
+            kwargs = cls.default_dict
+        dxy  = float(kwargs['Cell Width'])
+        if dxy <= 0:
+            raise ValueError('Cell Width must be positive, got {0}'.format(dxy))
+        numx = int(float(kwargs['X Dimension Extent']) / dxy)
+        numy = int(float(kwargs['Y Dimension Extent']) / dxy)
         return numy, numx  # x is columns, y is rows
 
     def get_update(self):
         return self.matrix.get_elevation_matrix()
 
-    def apply_to_nodes(self,function):
-        x_index_shuffled = np.random.shuffle(list(range(0,self.shape[0])))
-        y_index_shuffled = np.random.shuffle(list(range(0,self.shape[1])))
+    def get_coordinates(self):
+        dxy = self._dxy
+        xs  = np.arange(0,self.shape[0])*dxy
+        ys  = np.arange(0,self.shape[1])*dxy
+        return xs, ys
+
+    def apply_to_nodes(self,function,**kwargs):
+        x_index_shuffled = self.random.permutation(self.shape[0])
+        y_index_shuffled = self.random.permutation(self.shape[1])
         for ix in x_index_shuffled:
             for iy in y_index_shuffled:
-                function.simulate(ix,iy,self.matrix)
-            
+                function.simulate(ix,iy,self.matrix,x=self.xs[ix],y=self.ys[iy],**kwargs)
+
+    def step(self,physics_list,dt=1.0):
+        # whole grid kernels where available, per-cell dispatch only as fallback
+        for function in physics_list:
+            if function.supports_grid():
+                function.simulate_grid(self.matrix,self.xs,self.ys,dt=dt,random=self.random)
+            else:
+                self.apply_to_nodes(function,dt=dt)
+
     def assign_elevations(self,function):
+        if function.supports_grid():
+            function.simulate_grid(self.matrix,self.xs,self.ys)
+            return
+
         dxy = self._dxy
         for ix in range(0,self.shape[0]):
             for iy in range(0,self.shape[1]):
@@ -124,3 +285,65 @@ class Landscape(GeoSetting):
                 function.simulate(ix,iy,self.matrix,x=x,y=y)
             
             
+
+    ### checkpoints ###
+
+    def save_checkpoint(self,directory,step,params=None):
+        # Each checkpoint is its own directory of plain .npy files that can be
+        # memory mapped on restart. latest.json is swapped in atomically once
+        # the files are complete, so a crash never leaves a broken restart.
+        name   = 'checkpoint_{0:09d}'.format(step)
+        target = os.path.join(directory,name)
+        os.makedirs(target,exist_ok=True)
+        np.save(os.path.join(target,'bedrock.npy'),self.matrix._bedrock_map)
+        np.save(os.path.join(target,'sediment.npy'),self.matrix._sediment_map)
+        np.save(os.path.join(target,'elevation.npy'),self.matrix._get_elevation())
+        random_state = self.random.get_state()
+        state = {
+            'step'        : step,
+            'dimensions'  : self.dimensions,
+            'params'      : params or {},
+            'random_state': [random_state[0],random_state[1].tolist()] + list(random_state[2:]),
+        }
+        with open(os.path.join(target,'state.json'),'w') as stream:
+            json.dump(state,stream)
+
+        pointer = os.path.join(directory,self.checkpoint_pointer)
+        with open(pointer+'.tmp','w') as stream:
+            json.dump({'checkpoint': name},stream)
+        os.replace(pointer+'.tmp',pointer)
+        self._remove_old_checkpoints(directory,name)
+        return target
+
+    def _remove_old_checkpoints(self,directory,current):
+        # pruning is relative to the checkpoint just written, the one latest.json
+        # points to: older ones beyond checkpoints_kept go, and later steps can
+        # only be leftovers of an earlier run in a reused directory
+        names = sorted(name for name in os.listdir(directory) if name.startswith('checkpoint_'))
+        older = [name for name in names if name < current]
+        stale = older[:max(len(older)-self.checkpoints_kept+1,0)] + [name for name in names if name > current]
+        for name in stale:
+            shutil.rmtree(os.path.join(directory,name),ignore_errors=True)
+
+    @classmethod
+    def read_checkpoint(cls,directory):
+        with open(os.path.join(directory,cls.checkpoint_pointer)) as stream:
+            target = os.path.join(directory,json.load(stream)['checkpoint'])
+        with open(os.path.join(target,'state.json')) as stream:
+            state = json.load(stream)
+        return target, state
+
+    @classmethod
+    def from_checkpoint(cls,directory,restore_random_state=True):
+        # copy-on-write memory maps: nothing is read until it is touched and
+        # the checkpoint files themselves are never modified
+        target, state = cls.read_checkpoint(directory)
+        bedrock   = np.load(os.path.join(target,'bedrock.npy'),mmap_mode='c')
+        sediment  = np.load(os.path.join(target,'sediment.npy'),mmap_mode='c')
+        elevation = np.load(os.path.join(target,'elevation.npy'),mmap_mode='c')
+        landscape = cls(state['dimensions'],maps=(bedrock,sediment,elevation))
+        if restore_random_state:
+            random_state = state['random_state']
+            landscape.random.set_state((random_state[0],np.asarray(random_state[1],dtype=np.uint32))
+                                + tuple(random_state[2:]))
+        return landscape, state
@@ -4,21 +4,9 @@ Created on Tue Sep 25 11:09:17 2018
 @author: kevinmendoza
 """
 import numpy as np
+from pylem.physics.erosion import HillslopeCreep
 
     
-class HillslopeCreep():
-    def __init__(self,**kwargs):
-        self.c =float(kwargs['Gradient Constant'])
-        
-    def simulate(self,node):
-        gradient =node.get_gradient()
-        if gradient <= 0:
-                new_node=node.get_lowest_node()
-                sediment_to_move = np.abs(gradient)*self.c
-                new_node.z+=sediment_to_move
-                node.z-=sediment_to_move
-        
-    
 class _WaterBot_():
     
     def __init__(self):
@@ -3,19 +3,47 @@ Created on Oct 4, 2018
 
 @author: kevinmendoza
 '''
+import os
+import threading
+from collections import OrderedDict
 import numpy as np
-from scipy import interpolate
 
+from pylem.physics import dem
 from pylem.physics.base import GeoFunction, GeoMatrix
 from pylem.physics.landscape import _LandscapeMatrix
 
 class FromFileElevation():
-    
+    required_keys = ['file']
     def __init__(self,**kwargs):
-        pass
-    
+        self.activate = False
+        if all(name in kwargs.keys() for name in self.required_keys) and os.path.isfile(str(kwargs['file'])):
+            self.activate = True
+            self.define_value_source(**kwargs)
+
+    def define_value_source(self,**kwargs):
+        self.dem = dem.open_dem(str(kwargs['file']),
+                                format=kwargs.get('format','auto'),
+                                rows=kwargs.get('rows'),
+                                columns=kwargs.get('columns'),
+                                dtype=kwargs.get('dtype','float32'),
+                                offset=kwargs.get('offset',0))
+        # a pixel size stored in the file wins over the panel's value
+        self.cell_width = float(self.dem.cell_width or kwargs.get('DEM Cell Width',1.0))
+        self.x_offset   = float(kwargs.get('X Offset',0.0))
+        self.y_offset   = float(kwargs.get('Y Offset',0.0))
+
     def get_elevation(self,coordinates):
-        pass
+        if not self.activate:
+            return 0
+        x = np.atleast_1d(coordinates[0])
+        y = np.atleast_1d(coordinates[1])
+        return self.get_elevation_grid(x,y)[0,0]
+
+    def get_elevation_grid(self,xs,ys):
+        if not self.activate:
+            return np.zeros((xs.shape[0],ys.shape[0]))
+        return dem.resample(self.dem,xs,ys,cell_width=self.cell_width,
+                            x_offset=self.x_offset,y_offset=self.y_offset)
 
 class RandomElevation():
     required_keys = ['seed','Cell Width','X Dimension Extent',
@@ -36,11 +64,15 @@ class RandomElevation():
         self.y_vals = np.arange(0,self.xy[1]+dxy,dxy)
         
     def define_value_source(self,**kwargs):
+        # scipy.interpolate is slow to import and only needed here
+        from scipy import interpolate
         x_points = np.linspace(0,self.xy[0],num=int(kwargs['divisions'])+1)
         y_points = np.linspace(0,self.xy[1],num=int(kwargs['divisions'])+1)
         xx, yy = np.meshgrid(x_points,y_points)
-        np.random.seed(seed=int(kwargs['seed']))
-        z = np.random.uniform(size=xx.shape,high=float(kwargs['weight'])) + float(kwargs['mean'])
+        # a private generator, the surface must not depend on or disturb the
+        # global random state
+        random = np.random.RandomState(seed=int(kwargs['seed']))
+        z = random.uniform(size=xx.shape,high=float(kwargs['weight'])) + float(kwargs['mean'])
 
         if z.shape[0]==2:
             k = 1
@@ -56,14 +88,85 @@ class RandomElevation():
         x = coordinates[0]
         y = coordinates[1]
         return self.function.ev(x,y)
+
+    def get_elevation_grid(self,xs,ys):
+        if not self.activate:
+            return np.zeros((xs.shape[0],ys.shape[0]))
+        # one spline evaluation over the full x/y mesh, row ix holds x=xs[ix]
+        return self.function(xs,ys,grid=True)
     
+class ArrayElevation():
+    # surface handed over as an already evaluated grid, e.g. shared between runs
+    def __init__(self,array=None,**kwargs):
+        self.array = array
+
+    def get_elevation_grid(self,xs,ys):
+        return self.array
+
 class GaussianElevation():
-    
+    # f(x,y) = A*exp(-b*(c*x'^2 + d*y'^2)) with d = 1 and (x',y') the grid
+    # rotated about the domain center and scaled by half the longer extent.
+    # Landscape rows run along y and columns along x, as for DEMs, so the
+    # axis 0 coordinates are centred on Y/2 and the axis 1 ones on X/2.
+    # Scaled coordinates do not change with the units, so the exponential is
+    # cached on (c/d, b, rotation, grid) and only rescaled by A. Previews and
+    # runs build surfaces on different threads, so the cache is locked.
+    required_keys = ['weight:(A)','xy_ratio:(c/d)','decay:(b)','xy rotation:(degrees)',
+                     'X Dimension Extent','Y Dimension Extent']
+    cache_size    = 8
+    _cache        = OrderedDict()
+    _cache_lock   = threading.Lock()
+
     def __init__(self,**kwargs):
-        pass
-    
-    def get_elevation(self,*args,**kwargs):
-        return 0
+        if all(name in kwargs.keys() for name in self.required_keys):
+            self.activate = True
+            self.define_value_source(**kwargs)
+        else:
+            self.activate = False
+
+    def define_value_source(self,**kwargs):
+        self.weight   = float(kwargs['weight:(A)'])
+        self.ratio    = float(kwargs['xy_ratio:(c/d)'])
+        self.decay    = float(kwargs['decay:(b)'])
+        self.rotation = np.radians(float(kwargs['xy rotation:(degrees)']))
+        extent        = np.asarray([float(kwargs['X Dimension Extent']),
+                                    float(kwargs['Y Dimension Extent'])],dtype=np.float64)
+        self.center   = extent/2
+        self.scale    = max(extent.max()/2,np.finfo(np.float64).tiny)
+
+    def shape_function(self,u,v):
+        c, s = np.cos(self.rotation), np.sin(self.rotation)
+        xr   = c*u + s*v
+        yr   = c*v - s*u
+        return np.exp(-self.decay*(self.ratio*xr*xr + yr*yr))
+
+    def get_elevation(self,coordinates):
+        if not self.activate:
+            return 0
+        u = (coordinates[1] - self.center[0])/self.scale
+        v = (coordinates[0] - self.center[1])/self.scale
+        return self.weight*self.shape_function(u,v)
+
+    def get_elevation_grid(self,xs,ys):
+        if not self.activate:
+            return np.zeros((xs.shape[0],ys.shape[0]))
+        u   = (ys - self.center[0])/self.scale
+        v   = (xs - self.center[1])/self.scale
+        key = (self.ratio,self.decay,self.rotation,
+               v.shape[0],u.shape[0],) + tuple(np.round(np.r_[v[:1],v[-1:],u[:1],u[-1:]],12))
+        with self._cache_lock:
+            shape = self._cache.get(key)
+            if shape is not None:
+                self._cache.move_to_end(key)
+        if shape is None:
+            # evaluated outside the lock, a rare duplicate is cheaper than
+            # holding up other threads for a whole grid
+            shape = self.shape_function(u[None,:],v[:,None])
+            with self._cache_lock:
+                self._cache[key] = shape
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return self.weight*shape
 
 class GeoForcing(GeoFunction):
 
@@ -76,30 +179,54 @@ class GeoForcing(GeoFunction):
     def init_defaults(self):
         c, s = np.cos(0),np.sin(0)
         self.vector_op_dict = {
-            'slope' : np.asarray([-1,1]),
+            'slope' : np.asarray([[-1],[1]]),
             'adjust': np.asarray([3,3]),
             'R'     : np.array(((c,-s),(s,c)))
         }
+        self.rate      = 0.0
+        self._mask_key = None
+        self._mask     = None
 
     def create_variables(self,**kwargs):
-        if self.required_keys_exist():
-            radians = np.radians(kwargs['Azimuth'])
+        if self.required_keys_exist(**kwargs):
+            radians = np.radians(float(kwargs['Azimuth']))
             c, s = np.cos(radians), np.sin(radians)
             self.vector_op_dict = {
                 'slope' : np.asarray([[-1],[1]]),
-                'adjust': np.asarray([ kwargs['X Center'], kwargs['Y Center'] ]),
+                'adjust': np.asarray([ float(kwargs['X Center']), float(kwargs['Y Center']) ]),
                 'R'     : np.asarray(((c,-s),(s,c)))
             }
-            self.rate = kwargs['Rate']
+            self.rate = float(kwargs['Rate'])
+            # fault geometry changed, the cached side mask is stale
+            self._mask_key = None
 
-    def simulate(self, ix: int, iy: int, matrix :GeoMatrix,x=0,y=0,**kwargs):
+    def simulate(self, ix: int, iy: int, matrix :GeoMatrix,x=0,y=0,dt=1.0,**kwargs):
         vec = np.asarray([x,y])
         recenter = vec - self.vector_op_dict['adjust']
         align    = self.vector_op_dict['R'].dot(recenter)
         final    = align.dot(self.vector_op_dict['slope'])
 
         if final < 0:
-            matrix.add_elevation(ix,iy,self.rate)
+            matrix.add_elevation(ix,iy,self.rate*dt)
+
+    def supports_grid(self):
+        return True
+
+    def get_fault_mask(self,xs,ys):
+        key = (xs.shape[0],ys.shape[0],xs[-1] if xs.shape[0] else 0,ys[-1] if ys.shape[0] else 0)
+        if key != self._mask_key:
+            # slope.(R.(v - adjust)) == (R^T.slope).(v - adjust)
+            weights  = self.vector_op_dict['R'].T.dot(self.vector_op_dict['slope']).ravel()
+            dx       = xs - self.vector_op_dict['adjust'][0]
+            dy       = ys - self.vector_op_dict['adjust'][1]
+            final    = np.add.outer(weights[0]*dx,weights[1]*dy)
+            self._mask     = final < 0
+            self._mask_key = key
+        return self._mask
+
+    def simulate_grid(self, matrix: GeoMatrix, xs, ys, dt=1.0, **kwargs):
+        mask = self.get_fault_mask(xs,ys)
+        matrix.add_elevation_matrix(self.rate*dt,mask=mask)
 
 
 class InitialSurface(GeoFunction):
@@ -118,6 +245,8 @@ class InitialSurface(GeoFunction):
             self.elevation_map = RandomElevation(**kwargs)
         elif key=='gaussian':
             self.elevation_map = GaussianElevation(**kwargs)
+        elif key=='array':
+            self.elevation_map = ArrayElevation(**kwargs)
         else:
             self.elevation_map = FromFileElevation(**kwargs)
         
@@ -125,3 +254,11 @@ class InitialSurface(GeoFunction):
         if self.activate:
             z = self.elevation_map.get_elevation(np.asarray([x,y]))
             matrix.set_elevation(ix, iy, z)
+
+    def supports_grid(self):
+        return self.activate and hasattr(self.elevation_map,'get_elevation_grid')
+
+    def simulate_grid(self, matrix: GeoMatrix, xs, ys, **kwargs):
+        z = self.elevation_map.get_elevation_grid(xs,ys)
+        matrix.set_elevation_matrix(z)
+
@@ -0,0 +1,82 @@
+'''
+Created on Oct 18, 2026
+
+@author: kevinmendoza
+
+Headless runner, does not import any of the gui packages:
+
+    python -m pylem.run config.yaml -o output_directory
+    python -m pylem.run --resume checkpoint_directory -o output_directory
+'''
+import argparse
+import json
+import os
+import time
+import numpy as np
+from pylem.controller.batch import BatchController
+from pylem.model.model import MainModel
+from pylem.physics.landscape import Landscape
+
+
+def load_config(path):
+    with open(path) as stream:
+        if path.endswith('.json'):
+            return json.load(stream)
+        import yaml
+        return yaml.safe_load(stream) or {}
+
+def run(config,output=None,resume=None,force=False):
+    model      = MainModel()
+    controller = BatchController(model,config)
+    estimate   = model.estimate_cost(controller)
+    if estimate.exceeds_memory() and not force:
+        raise MemoryError('the run needs {0}, more than the memory budget'.format(estimate.describe()))
+    start      = time.time()
+    if resume:
+        landscape = model.run_from_checkpoint(controller,resume)
+    else:
+        landscape = model.run_simulation(controller)
+    runtime    = time.time() - start
+    if output:
+        write_outputs(output,landscape,controller,runtime)
+    return landscape, controller, runtime
+
+def write_outputs(directory,landscape,controller,runtime):
+    os.makedirs(directory,exist_ok=True)
+    np.save(os.path.join(directory,'elevation.npy'),landscape.matrix.get_elevation_matrix())
+    np.save(os.path.join(directory,'bedrock.npy'),landscape.matrix.get_bedrock_matrix())
+    np.save(os.path.join(directory,'sediment.npy'),landscape.matrix.get_sediment_matrix())
+    summary = {
+        'config'     : controller.get_config(),
+        'shape'      : list(landscape.shape),
+        'iterations' : controller.progress[0],
+        'years'      : controller.progress[1],
+        'runtime'    : runtime,
+    }
+    with open(os.path.join(directory,'summary.json'),'w') as stream:
+        json.dump(summary,stream,indent=2)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pylem.run',description='Run a lemex simulation without the gui.')
+    parser.add_argument('config',nargs='?',help='yaml or json file with simulation, surface, geology, waterbot and hillslope sections')
+    parser.add_argument('-o','--output',default=None,help='output directory, defaults to the config\'s output entry')
+    parser.add_argument('--resume',default=None,help='checkpoint directory to continue from, its parameters are used unless a config is given')
+    parser.add_argument('--force',action='store_true',help='allocate grids over the memory budget')
+    args   = parser.parse_args(argv)
+    if args.config:
+        config = load_config(args.config)
+    elif args.resume:
+        config = Landscape.read_checkpoint(args.resume)[1]['params']
+    else:
+        parser.error('a config or --resume is required')
+    output = args.output or config.get('output','output')
+    try:
+        landscape, controller, runtime = run(config,output=output,resume=args.resume,force=args.force)
+    except MemoryError as error:
+        parser.exit(1,'{0}, use --force to run it anyway\n'.format(error))
+    print('{0} iterations on a {1}x{2} grid in {3:.2f} s, written to {4}'.format(
+        controller.progress[0],landscape.shape[0],landscape.shape[1],runtime,output))
+
+
+if __name__ == '__main__':
+    main()
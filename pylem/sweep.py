@@ -0,0 +1,163 @@
+'''
+Created on Oct 18, 2026
+
+@author: kevinmendoza
+
+Parameter sweeps over a process pool:
+
+    python -m pylem.sweep sweep.yaml -o output_directory
+
+The config is a pylem.run config with an extra 'sweep' section holding
+lists of values per parameter, e.g.
+
+    sweep:
+      waterbot: {Gradient Constant: [0.1, 1.0], Exponential Law: [1, 2]}
+      surface:  {seed: [1, 2, 3]}
+
+Every combination is one run. Initial surfaces are generated once per
+distinct surface/grid combination and shared with the workers through
+shared memory.
+'''
+import argparse
+import csv
+import itertools
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pylem.controller.batch import BatchController
+from pylem.model.model import MainModel
+from pylem.physics.surface import InitialSurface
+from pylem.run import load_config, write_outputs
+
+run_folders  = ['Checkpoint Directory','Output Directory']
+
+
+def expand_grid(config):
+    sweep  = config.get('sweep') or {}
+    axes   = [(section,key,values) for section, entries in sweep.items()
+                                   for key, values in entries.items()]
+    runs   = []
+    for values in itertools.product(*[axis[2] for axis in axes]):
+        run_config = {name: dict(section) for name, section in config.items()
+                      if isinstance(section,dict) and name != 'sweep'}
+        overrides  = {}
+        for (section,key,_), value in zip(axes,values):
+            run_config.setdefault(section,{})[key] = value
+            overrides[section+'.'+key] = value
+        runs.append((overrides,run_config))
+    return runs
+
+def separate_run_folders(index,run_config,output):
+    # runs execute side by side, each gets its own checkpoints and history
+    # under <output>/run_XXXX instead of sharing the configured folders
+    simulation = run_config.setdefault('simulation',{})
+    defaults   = BatchController.default_config['simulation']
+    for key in run_folders:
+        folder          = os.path.basename(os.path.normpath(str(simulation.get(key,defaults[key]))))
+        simulation[key] = os.path.join(output or '.','run_{0:04d}'.format(index),folder)
+    return run_config
+
+def surface_signature(controller: BatchController):
+    # the same key the model's surface cache uses, grid keys and Precision
+    # included and values normalised
+    return controller.model.surface_cache.make_key(controller.get_surface_params(),
+                                                   controller.get_simulation_params())
+
+def generate_surface(controller: BatchController):
+    model     = MainModel()
+    landscape = model.generate_landscape(controller)
+    landscape.assign_elevations(model.create_initial_surface_operator(controller))
+    return landscape.matrix.get_bedrock_matrix()
+
+def share_array(array):
+    memory = shared_memory.SharedMemory(create=True,size=max(array.nbytes,1))
+    view   = np.ndarray(array.shape,dtype=array.dtype,buffer=memory.buf)
+    view[:] = array
+    return memory, (memory.name,array.shape,array.dtype.str)
+
+def _run_one(index,overrides,run_config,surface,output):
+    name, shape, dtype = surface
+    memory     = shared_memory.SharedMemory(name=name)
+    try:
+        initial    = np.ndarray(shape,dtype=np.dtype(dtype),buffer=memory.buf)
+        model      = MainModel()
+        controller = BatchController(model,run_config)
+        start      = time.time()
+        landscape  = model.run_simulation(controller,initial_surface=InitialSurface({'type':'array','array':initial}))
+        runtime    = time.time() - start
+        elevation  = landscape.matrix.get_elevation_matrix()
+        row = {
+            'run'           : index,
+            **overrides,
+            'iterations'    : controller.progress[0],
+            'years'         : controller.progress[1],
+            'mean elevation': float(np.nanmean(elevation)),
+            'min elevation' : float(np.nanmin(elevation)),
+            'max elevation' : float(np.nanmax(elevation)),
+            'mean change'   : float(np.nanmean(elevation - initial)),
+            'mean sediment' : float(np.nanmean(landscape.matrix.get_sediment_matrix())),
+            'runtime'       : runtime,
+        }
+        del initial
+        if output:
+            write_outputs(os.path.join(output,'run_{0:04d}'.format(index)),landscape,controller,runtime)
+        return row
+    finally:
+        memory.close()
+
+def sweep(config,output=None,workers=None,save_grids=False):
+    runs     = expand_grid(config)
+    memories = {}
+    surfaces = []
+    try:
+        for overrides, run_config in runs:
+            signature = surface_signature(BatchController(MainModel(),run_config))
+            if signature not in memories:
+                controller = BatchController(MainModel(),run_config)
+                memories[signature] = share_array(generate_surface(controller))
+            surfaces.append(memories[signature][1])
+
+        run_output = output if save_grids else None
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = [pool.submit(_run_one,index,overrides,separate_run_folders(index,run_config,output),
+                                   surface,run_output)
+                       for index, ((overrides,run_config),surface) in enumerate(zip(runs,surfaces))]
+            rows    = [future.result() for future in futures]
+    finally:
+        for memory, _ in memories.values():
+            memory.close()
+            memory.unlink()
+
+    if output:
+        write_summary(os.path.join(output,'summary.csv'),rows)
+    return rows
+
+def write_summary(path,rows):
+    os.makedirs(os.path.dirname(path) or '.',exist_ok=True)
+    columns = []
+    for row in rows:
+        columns+= [key for key in row.keys() if key not in columns]
+    with open(path,'w',newline='') as stream:
+        writer = csv.DictWriter(stream,fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pylem.sweep',description='Run a grid of lemex simulations in parallel.')
+    parser.add_argument('config',help='pylem.run config with a sweep section')
+    parser.add_argument('-o','--output',default=None,help='output directory, defaults to the config\'s output entry')
+    parser.add_argument('-j','--workers',type=int,default=None,help='worker processes, one per core by default')
+    parser.add_argument('--save-grids',action='store_true',help='also write the grids of every run')
+    args   = parser.parse_args(argv)
+    config = load_config(args.config)
+    output = args.output or config.get('output','output')
+    start  = time.time()
+    rows   = sweep(config,output=output,workers=args.workers,save_grids=args.save_grids)
+    print('{0} runs in {1:.2f} s, summary written to {2}'.format(
+        len(rows),time.time()-start,os.path.join(output,'summary.csv')))
+
+
+if __name__ == '__main__':
+    main()
@@ -50,6 +50,10 @@ class FieldComboBox(QGridLayout):
 
         self.combo_box.activated.connect(self.update)
 
+    def setHidden(self,value):
+        self.label.setHidden(value)
+        self.combo_box.setHidden(value)
+
     def align_widgets(self):
         self.addWidget(self.label, 0,0,1,1)
         self.addWidget(self.combo_box,0,1,1,1)
@@ -137,6 +141,17 @@ class Field(QGridLayout):
         self.entry.setText(fstring)
         self.controller(self.key,value,update_plot=False)
 
+class TextField(Field):
+    # free text such as file paths, handed over once editing is finished
+    # instead of on every keystroke
+    def add_controller(self,controller):
+        self.controller = controller
+        self.entry.editingFinished.connect(self.editing_finished)
+        self.default_init()
+
+    def editing_finished(self):
+        self.controller(self.key,self.entry.text(),update_controller=True)
+
 class UnitField(QGridLayout):
 
     def __init__(self,*args,unit_layout='m/s',**kwargs):
@@ -9,7 +9,6 @@ import pyqtgraph.opengl as gl
 from PyQt5.QtWidgets import QGridLayout
 from pylem.view._view_ import FieldMonitor
 from pylem.controller.controller import MainController
-import matplotlib.cm as cm
 import matplotlib.pyplot as plt
 import numpy as np
 
@@ -24,12 +23,15 @@ class Surface(QGridLayout):
     def add_controller(self,controller: MainController):
         controller._update_iterations       = self.update_iterations
         controller._update_total_iterations = self.update_total_iterations
+        controller._update_render_stats     = self.update_render_stats
         self.viewbox.add_controller(controller)
         
     def create_widgets(self):
         self.viewbox           = CustomPlot()
         self.simulation_readout= FieldMonitor(name="Iterations:",default_value='0')
         self.iteration_count   = FieldMonitor(name="Years:",default_value='0')
+        self.frame_readout     = FieldMonitor(name="Frames (rendered/dropped):",default_value='0/0')
+        self.render_readout    = FieldMonitor(name="Render:",default_value='0 ms')
         
     def align_widgets(self):
         self.setColumnMinimumWidth(0,200)
@@ -39,6 +41,8 @@ class Surface(QGridLayout):
         self.addWidget(self.viewbox,     0,0,1,3)
         self.addLayout(self.simulation_readout,1,0,1,1)
         self.addLayout(self.iteration_count,1,2,1,1)
+        self.addLayout(self.frame_readout,2,0,1,1)
+        self.addLayout(self.render_readout,2,2,1,1)
         
     def update_iterations(self,iterations,year):
         str1 = str(iterations) + '/' + str(self.total_iterations)
@@ -49,15 +53,58 @@ class Surface(QGridLayout):
     def update_total_iterations(self,total_iterations,total_year):
         self.total_year       = total_year
         self.total_iterations = total_iterations
+
+    def update_render_stats(self,policy):
+        self.frame_readout.update_field(str(policy.rendered) + '/' + str(policy.dropped))
+        self.render_readout.update_field('{0:.1f} ms'.format(policy.render_ms))
         
         
+def decimate(matrix,factor,mode='extreme'):
+    # factor x factor blocks reduced to one vertex, the blocks along the far
+    # edges may be smaller. 'mean' averages a block, 'extreme' keeps whichever
+    # of its minimum or maximum lies further from the mean, so ridges and
+    # valleys survive the reduction.
+    if factor <= 1:
+        return matrix
+    rows    = np.arange(0,matrix.shape[0],factor)
+    columns = np.arange(0,matrix.shape[1],factor)
+    counts  = np.outer(np.diff(np.append(rows,matrix.shape[0])),np.diff(np.append(columns,matrix.shape[1])))
+    # along the contiguous rows first, that pass shrinks the data the most
+    mean    = np.add.reduceat(np.add.reduceat(matrix,columns,axis=1,dtype=np.float64),rows,axis=0) / counts
+    if mode == 'mean':
+        return mean
+    high    = np.maximum.reduceat(np.maximum.reduceat(matrix,columns,axis=1),rows,axis=0)
+    low     = np.minimum.reduceat(np.minimum.reduceat(matrix,columns,axis=1),rows,axis=0)
+    return np.where(high - mean > mean - low,high,low)
+
+class LevelOfDetail:
+    # Vertex budget of the view: one vertex per pixels_per_vertex^2 screen
+    # pixels the surface covers. The surface spans two scene units, zooming
+    # in covers more pixels and raises the budget until every cell is drawn.
+    pixels_per_vertex = 2
+    min_vertices      = 10000
+    mode              = 'extreme'
+
+    def __init__(self,view):
+        self.view = view
+
+    def get_budget(self):
+        visible  = 2*self.view.opts['distance']*np.tan(np.radians(self.view.opts['fov'])/2)
+        coverage = 2/max(visible,1e-12)
+        pixels   = self.view.width()*self.view.height()*coverage*coverage
+        return max(self.min_vertices,int(pixels / self.pixels_per_vertex**2))
+
+    def get_factor(self,shape):
+        cells = shape[0]*shape[1]
+        return max(1,int(np.ceil(np.sqrt(cells / self.get_budget()))))
+
 class CustomPlot(gl.GLViewWidget):
     def __init__(self):
         super().__init__()
         self.boundary_object = BoundaryObject()
         color_scale     = ColorScaleObject()
         #self.fault_trace     = Fault2Coordinates(boundary_object)
-        self.surface         = SurfacePlot(color_scale,self.boundary_object)
+        self.surface         = SurfacePlot(color_scale,self.boundary_object,LevelOfDetail(self))
         self.xygrid          = XYGrid(self.boundary_object)
         #self.addItem(self.fault_trace)
         self.addItem(self.surface)
@@ -67,6 +114,7 @@ class CustomPlot(gl.GLViewWidget):
         controller._update_map     = self.update_map
         controller._update_surface = self.update_surface
         controller._update_fault   = self.update_fault
+        controller._reset_surface  = self.reset_surface
 
     def update_map(self,controller):
         self.boundary_object.update(controller)
@@ -78,6 +126,16 @@ class CustomPlot(gl.GLViewWidget):
     def update_surface(self,matrix):
         self.surface.update_surface(matrix)
 
+    def reset_surface(self):
+        self.surface.color.reset_range()
+
+    def wheelEvent(self,ev):
+        super().wheelEvent(ev)
+        self.surface.refresh_detail()
+
+    def resizeGL(self,w,h):
+        super().resizeGL(w,h)
+        self.surface.refresh_detail()
 
 
 class BoundaryObject:
@@ -103,49 +161,131 @@ class BoundaryObject:
             self.upper      = [ 1,  1/ratio]
             self.lower      = [-1, -1/ratio]
 
-    def create_xseries(self):
-        return np.linspace(self.lower[0],self.upper[0],num=int(self.cells[0]))
+    def create_xseries(self,num=None):
+        return np.linspace(self.lower[0],self.upper[0],num=int(self.cells[0]) if num is None else num)
 
-    def create_yseries(self):
-        return np.linspace(self.lower[1],self.upper[1],num=int(self.cells[1]))
+    def create_yseries(self,num=None):
+        return np.linspace(self.lower[1],self.upper[1],num=int(self.cells[1]) if num is None else num)
 
     def scale_xy_grid(self,other: gl.GLGridItem):
         other.setSize(x=self.upper[0]-self.lower[0],y=self.upper[1]-self.lower[1],z=1)
 
 class ColorScaleObject:
+    # Heights are mapped onto a precomputed plasma lookup table with a single
+    # np.take into a reused buffer. The table holds float32 RGBA because that
+    # is what the GL vertex colours are uploaded as, uint8 would be converted
+    # again on every frame. The colour range is either fixed, or adapts: the
+    # drawn surface is only measured on every range_interval-th frame, new
+    # extremes then widen the range at once while it narrows slowly, and
+    # heights in between are clipped. reset_range measures a new surface on
+    # its first frame.
+    CUTOFF         = 1e-16
+    entries        = 1024
+    range_interval = 5
+    shrink_rate    = 0.1
 
-    CUTOFF = 1e-16
-    def __init__(self):
-        self.color_mapping = cm.ScalarMappable(cmap=plt.get_cmap('plasma') )
+    def __init__(self,value_range=None):
+        self.lut     = plt.get_cmap('plasma')(np.linspace(0,1,self.entries)).astype(np.float32)
+        self.fixed   = value_range is not None
+        self.low, self.high = value_range if self.fixed else (None,None)
+        self._frame  = 0
+        self._scaled = None
+        self._index  = None
 
-    def convert_to_colors(self,matrix):
-        min = np.min(matrix)
-        max = np.max(matrix)
-        if min - max > self.CUTOFF:
-            values = (matrix - min) / (max - min)
-        else:
-            values = matrix
+    def set_range(self,low,high):
+        self.fixed, self.low, self.high = True, float(low), float(high)
 
-        return self.color_mapping.to_rgba(values)
+    def release_range(self):
+        self.fixed = False
+        self.reset_range()
 
+    def reset_range(self):
+        # a fixed range is kept, an adaptive one is measured afresh
+        if not self.fixed:
+            self.low, self.high, self._frame = None, None, 0
 
-class SurfacePlot(gl.GLSurfacePlotItem):
+    def update_range(self,matrix):
+        if self.fixed:
+            return
+        self._frame = (self._frame + 1) % self.range_interval
+        if self.low is not None and self._frame != 0:
+            return
+        low, high = float(np.nanmin(matrix)), float(np.nanmax(matrix))
+        if self.low is None:
+            self.low, self.high = low, high
+            return
+        self.low  = low  if low  < self.low  else self.low  + self.shrink_rate*(low  - self.low)
+        self.high = high if high > self.high else self.high + self.shrink_rate*(high - self.high)
 
-    def __init__(self,color,boundary):
-        super().__init__()
+    def convert_to_colors(self,matrix,out=None):
+        self.update_range(matrix)
+        if self._scaled is None or self._scaled.shape != matrix.shape:
+            self._scaled = np.empty(matrix.shape,dtype=np.float32)
+            self._index  = np.empty(matrix.shape,dtype=np.intp)
+        if out is None:
+            out = np.empty(matrix.shape + (4,),dtype=np.float32)
+        if self.high - self.low > self.CUTOFF:
+            np.subtract(matrix,self.low,out=self._scaled)
+            self._scaled *= (self.entries - 1) / (self.high - self.low)
+            np.clip(self._scaled,0,self.entries - 1,out=self._scaled)
+            with np.errstate(invalid='ignore'):
+                np.copyto(self._index,self._scaled,casting='unsafe')
+        else:
+            self._index.fill(0)
+        # nan heights cast to a negative index, clipped onto the first entry
+        np.take(self.lut,self._index,axis=0,out=out,mode='clip')
+        return out
+
+
+class SurfacePlot(gl.GLSurfacePlotItem):
+    # The vertex grid and faces only change with the grid shape or extent.
+    # Every other frame writes z and the colours into buffers preallocated
+    # for that shape and hands only those to setData, which then leaves the
+    # x/y columns and the faces alone. Normals are never used for drawing.
+    def __init__(self,color,boundary,detail=None):
+        super().__init__(computeNormals=False)
         self.color    = color
         self.boundary = boundary
+        self.detail   = detail
         self.z_scale   = 1
         self.z_offset  = 0
+        self._layout   = None
+        self._z        = None
+        self._colors   = None
+        self._matrix   = None
+        self._factor   = 1
+
+    def refresh_detail(self):
+        # zooming or resizing only redraws when the level of detail changes
+        if self._matrix is not None and self.detail.get_factor(self._matrix.shape) != self._factor:
+            self.update_surface(self._matrix)
 
     def update_surface(self,matrix):
-        if self.boundary.connected:
-            xs      = self.boundary.create_xseries()
-            ys      = self.boundary.create_yseries()
-            if xs.shape[0] > 0 and ys.shape[0] > 0:
-                values  = (matrix - self.z_offset) * self.z_scale
-                colors  = self.color.convert_to_colors(values)
-                self.setData(x=ys, y=xs, z=values,colors=colors)
+        if self.detail is not None:
+            # the full resolution matrix is kept for redraws at another level
+            self._matrix = matrix
+            self._factor = self.detail.get_factor(matrix.shape)
+            matrix       = decimate(matrix,self._factor,self.detail.mode)
+        if self.boundary.connected and matrix.shape[0] > 0 and matrix.shape[1] > 0:
+            np.subtract(matrix,self.z_offset,out=self.get_z_buffer(matrix.shape))
+            self._z *= self.z_scale
+            self.color.convert_to_colors(self._z,out=self._colors)
+            layout   = (matrix.shape,tuple(self.boundary.lower),tuple(self.boundary.upper))
+            if layout != self._layout:
+                # sized by the matrix, previews of large grids are coarser
+                xs   = self.boundary.create_xseries(matrix.shape[1])
+                ys   = self.boundary.create_yseries(matrix.shape[0])
+                self._layout = layout
+                self.setData(x=ys, y=xs, z=self._z,colors=self._colors)
+            else:
+                self.setData(z=self._z,colors=self._colors)
+
+    def get_z_buffer(self,shape):
+        if self._z is None or self._z.shape != shape:
+            # GL vertices are float32, more precision would be thrown away
+            self._z      = np.empty(shape,dtype=np.float32)
+            self._colors = np.empty(shape + (4,),dtype=np.float32)
+        return self._z
 
 class XYGrid(gl.GLGridItem):
 
@@ -6,7 +6,7 @@ Created on Tue Sep 25 11:26:38 2018
 @author: kevinmendoza
 """
 from PyQt5.QtWidgets import QCheckBox, QGridLayout, QLabel, QComboBox, QWidget
-from pylem.view._view_ import Field, UnitField
+from pylem.view._view_ import Field, UnitField, FieldComboBox
 from pylem.controller.controller import MainController, BriefParams
 import pylem.view._view_ as v
 
@@ -148,6 +148,12 @@ class OptionalPhysicsView(QGridLayout):
 
 
 class WaterBotParams(AbstractPhysicsView):
+    solvers = [
+        'stream power',
+        'implicit',
+        'waterbot'
+        ]
+
     def __init__(self):
         super().__init__()
 
@@ -160,6 +166,7 @@ class WaterBotParams(AbstractPhysicsView):
         gradient_offset  =  UnitField(self,name='Gradient Offset',default_value=0.0,unit_layout='space/time')
         base_load        =  UnitField(self,name='Base Offset',default_value=0.0,unit_layout='space')
         sediment_discharge= UnitField(self,name='Sediment Discharge %',default_value=10.0)
+        solver           =  FieldComboBox('Solver',self.solvers,'Solver')
         self.add_widget('Title',title)
         self.add_widget('Checkbox',checkbox)
         self.add_custom_widget(gradient_constant)
@@ -167,6 +174,7 @@ class WaterBotParams(AbstractPhysicsView):
         self.add_custom_widget(exponent)
         self.add_custom_widget(base_load)
         self.add_custom_widget(sediment_discharge)
+        self.add_custom_widget(solver)
         self.set_change_enable_widget('Checkbox')
 
     def align_widgets(self):
@@ -178,6 +186,7 @@ class WaterBotParams(AbstractPhysicsView):
         self._align("Gradient Offset",  1, 4, 1, 3)
         self._align("Base Offset",      2, 4, 1, 3)
         self._align("Sediment Discharge %",    3, 0, 1, 3)
+        self._align("Solver",                  3, 4, 1, 3)
 
     def _add_controller(self,controller: MainController):
         self.connect_params_to_MainController(controller.set_waterbot_params)
@@ -194,6 +203,15 @@ class WaterBotParams(AbstractPhysicsView):
         self.get_widget('Gradient Offset').multiply_and_set_value(multiplier,**kwargs)
 
 class HillslopeCreepParams(AbstractPhysicsView):
+    modes    = [
+        'explicit',
+        'implicit'
+        ]
+    stencils = [
+        '5-point',
+        '9-point'
+        ]
+
     def __init__(self):
         super().__init__()
         
@@ -202,15 +220,21 @@ class HillslopeCreepParams(AbstractPhysicsView):
         title.setFont(v.get_bold_font())
         checkbox = QCheckBox()
         gradient_constant= UnitField(self,name='Gradient Constant',default_value=1.0,unit_layout='space/time')
+        mode             = FieldComboBox('Mode',self.modes,'Mode')
+        stencil          = FieldComboBox('Stencil',self.stencils,'Stencil')
         self.add_widget('Title',title)
         self.add_widget('Checkbox',checkbox)
         self.add_custom_widget(gradient_constant)
+        self.add_custom_widget(mode)
+        self.add_custom_widget(stencil)
         self.set_change_enable_widget('Checkbox')
 
     def align_widgets(self):
         self._align('Title',             0, 0, 1, 1)
         self._align('Checkbox',          0, 1)
         self._align('Gradient Constant', 1, 0, 1, 1)
+        self._align('Mode',              2, 0, 1, 1)
+        self._align('Stencil',           2, 1, 1, 1)
 
     def _add_controller(self,controller: MainController):
         self.connect_params_to_MainController(controller.set_hillslope_params)
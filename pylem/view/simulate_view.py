@@ -5,9 +5,9 @@ Created on Wed Sep 26 13:00:46 2018
 
 @author: kevinmendoza
 """
-from PyQt5.QtWidgets import QGridLayout, QPushButton, QLabel, QComboBox
-from pylem.view._view_ import Field, FieldComboBox, UnitField
-from pylem.controller.controller import MainController, BriefParams
+from PyQt5.QtWidgets import QGridLayout, QPushButton, QLabel, QComboBox, QMessageBox
+from pylem.view._view_ import Field, FieldComboBox, UnitField, TextField
+from pylem.controller.controller import MainController, BriefParams, RenderPolicy
 import pylem.view._view_ as v
 
 
@@ -48,12 +48,52 @@ class Buttons(QGridLayout):
         
     def create_widgets(self):
         self.button = QPushButton('Start Simulation')
+        self.pause  = QPushButton('Pause')
+        self.cancel = QPushButton('Cancel')
+        self.paused = False
         
     def align_widgets(self):
         self.addWidget(self.button, 0, 0, 1, 1)
+        self.addWidget(self.pause,  0, 1, 1, 1)
+        self.addWidget(self.cancel, 0, 2, 1, 1)
         
     def add_controller(self,controller: MainController):
-        self.button.clicked.connect(controller.start_simulation)
+        self.controller = controller
+        self.controller._report_error = self.report_error
+        self.button.clicked.connect(self.start)
+        self.pause.clicked.connect(self.toggle_pause)
+        self.cancel.clicked.connect(self.stop)
+
+    def start(self):
+        self.set_paused(False)
+        estimate = self.controller.start_simulation()
+        if estimate is not None and self.confirm(estimate):
+            self.controller.start_simulation(confirmed=True)
+
+    def confirm(self,estimate):
+        answer = QMessageBox.question(self.button.parentWidget(),'Large simulation',
+                                      'This run needs {0}, more than the budget. Allocate it anyway?'
+                                      .format(estimate.describe()))
+        return answer == QMessageBox.Yes
+
+    def report_error(self,error):
+        QMessageBox.warning(self.button.parentWidget(),'Simulation failed','{0}: {1}'
+                            .format(type(error).__name__,error))
+
+    def stop(self):
+        self.set_paused(False)
+        self.controller.cancel_simulation()
+
+    def toggle_pause(self):
+        if self.paused:
+            self.controller.resume_simulation()
+        else:
+            self.controller.pause_simulation()
+        self.set_paused(not self.paused)
+
+    def set_paused(self,paused):
+        self.paused = paused
+        self.pause.setText('Resume' if paused else 'Pause')
 
 class SurfaceParamView(QGridLayout):
     keys=[
@@ -227,7 +267,9 @@ class Gaussian(QGridLayout):
         self.weight.multiply_and_set_value(multiplier,**kwargs)
         
 class FromFile(QGridLayout):
-    
+    formats = ['auto','npy','asc','tif','raw']
+    dtypes  = ['float32','float64','int16','int32','uint16']
+
     def __init__(self):
         super().__init__()
         self.show = False
@@ -237,26 +279,46 @@ class FromFile(QGridLayout):
         self.hide()
         
     def create_widgets(self):
-        self.label   = QLabel('test1')
-        self.weight  = Field(name='test2',default_value=1)
-        self.xy_ratio= Field(name='test3',default_value=1)
-        self.decay   = Field(name='test4',default_value=1)
-        
-        self.weight.add_controller(self.params.change_param)
-        self.xy_ratio.add_controller(self.params.change_param)
-        self.decay.add_controller(self.params.change_param)
+        self.label   = QLabel('DEM: .npy, ESRI .asc, GeoTIFF or raw binary')
+        self.file    = TextField(name='file',default_value='')
+        self.format  = FieldComboBox('format',self.formats,'format')
+        self.cell    = UnitField(name='DEM Cell Width',default_value=1,unit_layout='space')
+        self.x_off   = UnitField(name='X Offset',default_value=0,unit_layout='space')
+        self.y_off   = UnitField(name='Y Offset',default_value=0,unit_layout='space')
+        self.rows    = Field(name='rows',default_value=0)
+        self.columns = Field(name='columns',default_value=0)
+        self.dtype   = FieldComboBox('dtype',self.dtypes,'dtype')
+        
+        self.file.add_controller(self.params.change_param)
+        self.format.add_controller(self.params.change_param)
+        self.cell.add_controller(self.params.change_param)
+        self.x_off.add_controller(self.params.change_param)
+        self.y_off.add_controller(self.params.change_param)
+        self.rows.add_controller(self.params.change_param)
+        self.columns.add_controller(self.params.change_param)
+        self.dtype.add_controller(self.params.change_param)
         
     def align_widgets(self):
         self.addWidget(self.label,0,0,1,2)
-        self.addLayout(self.weight,1,0)
-        self.addLayout(self.xy_ratio,1,1)
-        self.addLayout(self.decay,2,0)
+        self.addLayout(self.file,1,0,1,2)
+        self.addLayout(self.format,2,0)
+        self.addLayout(self.cell,2,1)
+        self.addLayout(self.x_off,3,0)
+        self.addLayout(self.y_off,3,1)
+        self.addLayout(self.rows,4,0)
+        self.addLayout(self.columns,4,1)
+        self.addLayout(self.dtype,5,0)
         
     def hide(self):
         self.label.setHidden(self.show)
-        self.weight.setHidden(self.show)
-        self.xy_ratio.setHidden(self.show)
-        self.decay.setHidden(self.show)
+        self.file.setHidden(self.show)
+        self.format.setHidden(self.show)
+        self.cell.setHidden(self.show)
+        self.x_off.setHidden(self.show)
+        self.y_off.setHidden(self.show)
+        self.rows.setHidden(self.show)
+        self.columns.setHidden(self.show)
+        self.dtype.setHidden(self.show)
         
     def flipstate(self):
         self.show = not self.show
@@ -276,7 +338,9 @@ class FromFile(QGridLayout):
         pass
 
     def update_space(self,multiplier,**kwargs):
-        pass
+        self.cell.multiply_and_set_value(multiplier,**kwargs)
+        self.x_off.multiply_and_set_value(multiplier,**kwargs)
+        self.y_off.multiply_and_set_value(multiplier,**kwargs)
 
 class SimParams(QGridLayout):
     default_years = 1
@@ -285,6 +349,8 @@ class SimParams(QGridLayout):
     default_dx    = 10
     default_y     = 100
     default_dy    = 10
+    default_render_rate = 30
+    precisions    = ['float64','float32']
     def __init__(self):
         super().__init__()
         self.create_widgets()
@@ -294,11 +360,14 @@ class SimParams(QGridLayout):
         self.label = QLabel('Simulation Dimensions')
         self.label.setFont(v.get_bold_font())
         
-        self.time           = UnitField(self,name='Total Time',default_value=self.default_years,unit_layout='space')
-        self.d_time         = UnitField(self,name='Iterations per Time',default_value=self.default_dt,unit_layout='/time')
+        self.time           = UnitField(self,name='Total Time',key='Time',default_value=self.default_years,unit_layout='space')
+        self.d_time         = UnitField(self,name='Iterations per Time',key='Iterations/Time Interval',default_value=self.default_dt,unit_layout='/time')
         self.x_distance     = UnitField(self,name='X Dimension Extent',default_value=self.default_x,unit_layout='space')
         self.y_distance     = UnitField(self,name='Y Dimension Extent',default_value=self.default_y,unit_layout='space')
         self.dxy_distance   = UnitField(self,name='Cell Width',default_value=self.default_dx,unit_layout='space')
+        self.precision      = FieldComboBox('Precision',self.precisions,'Precision')
+        self.render_mode    = FieldComboBox('Render',RenderPolicy.modes,'Render Mode')
+        self.render_rate    = Field(name='Render Rate',default_value=self.default_render_rate)
         
     def align_widgets(self):
         self.addWidget(self.label,0,0,1,1)
@@ -307,6 +376,9 @@ class SimParams(QGridLayout):
         self.addLayout(self.x_distance,  2, 0, 1, 1)
         self.addLayout(self.dxy_distance, 2, 1, 1, 1)
         self.addLayout(self.y_distance,  3, 0, 1, 1)
+        self.addLayout(self.precision,   3, 1, 1, 1)
+        self.addLayout(self.render_mode, 4, 0, 1, 1)
+        self.addLayout(self.render_rate, 4, 1, 1, 1)
         
     def add_controller(self,controller: MainController):
         controller.set_simulation_params('Time',self.default_years)
@@ -320,6 +392,9 @@ class SimParams(QGridLayout):
         self.x_distance.add_controller(controller.set_simulation_params)
         self.y_distance.add_controller(controller.set_simulation_params)
         self.dxy_distance.add_controller(controller.set_simulation_params)
+        self.precision.add_controller(controller.set_simulation_params)
+        self.render_mode.add_controller(controller.set_render_params)
+        self.render_rate.add_controller(controller.set_render_params)
 
         controller.add_space_unit(self.update_space)
         controller.add_time_unit(self.update_time)
@@ -0,0 +1,17 @@
+import os
+
+from pylem.physics.landscape import Landscape
+
+
+def test_reused_directory_keeps_the_latest_checkpoint(tmp_path):
+    directory = str(tmp_path)
+    landscape = Landscape({'X Dimension Extent': 10,'Y Dimension Extent': 10,'Cell Width': 1})
+    for step in (100,200,300):
+        landscape.save_checkpoint(directory,step)
+    # a fresh run in the same directory writes lower steps than the old one
+    for step in (10,20):
+        landscape.save_checkpoint(directory,step)
+    target, state = Landscape.read_checkpoint(directory)
+    assert state['step'] == 20
+    assert sorted(name for name in os.listdir(directory) if name.startswith('checkpoint_')) == \
+        ['checkpoint_000000010','checkpoint_000000020']
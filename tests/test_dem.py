@@ -0,0 +1,60 @@
+import os
+import numpy as np
+import pytest
+
+from pylem.physics import dem
+from pylem.physics.landscape import Landscape
+from pylem.physics.surface import InitialSurface
+
+
+def make_dem(path,shape):
+    rows, columns = np.indices(shape)
+    array         = (3*rows + 0.01*columns**2).astype(np.float64)
+    np.save(path,array)
+    return array
+
+def test_matching_dem_loads_back_unchanged(tmp_path):
+    # 50 rows of y by 70 columns of x at a cell width of 1
+    path      = str(tmp_path / 'dem.npy')
+    array     = make_dem(path,(50,70))
+    params    = {'X Dimension Extent': 70,'Y Dimension Extent': 50,'Cell Width': 1}
+    landscape = Landscape(params)
+    landscape.assign_elevations(InitialSurface({'type': 'file','file': path,'DEM Cell Width': 1}))
+    assert landscape.shape == array.shape
+    np.testing.assert_array_equal(landscape.matrix.get_elevation_matrix(),array)
+
+def test_offsets_shift_rows_by_y_and_columns_by_x(tmp_path):
+    path   = str(tmp_path / 'dem.npy')
+    array  = make_dem(path,(50,70))
+    result = dem.resample(dem.open_dem(path),np.arange(20.0),np.arange(30.0),
+                          x_offset=5,y_offset=10)
+    np.testing.assert_array_equal(result,array[10:30,5:35])
+
+def test_half_cells_interpolate_between_neighbours(tmp_path):
+    path   = str(tmp_path / 'dem.npy')
+    array  = make_dem(path,(50,70))
+    result = dem.resample(dem.open_dem(path),np.arange(0.5,10),np.arange(0.5,12),block=4)
+    expected = (array[:-1,:-1] + array[1:,:-1] + array[:-1,1:] + array[1:,1:])/4
+    np.testing.assert_allclose(result,expected[:10,:12])
+
+def write_ascii(path,array,rows=None):
+    with open(path,'w') as stream:
+        stream.write('ncols {0}\nnrows {1}\ncellsize 1\n'.format(array.shape[1],rows or array.shape[0]))
+        for line in array:
+            stream.write(' '.join(str(value) for value in line) + '\n')
+
+def test_ascii_grids_are_cached_outside_their_directory(tmp_path,monkeypatch):
+    monkeypatch.setattr(dem,'cache_directory',str(tmp_path / 'cache'))
+    data  = tmp_path / 'data'
+    data.mkdir()
+    array = np.arange(12,dtype=np.float32).reshape(3,4)
+    write_ascii(str(data / 'dem.asc'),array)
+    np.testing.assert_array_equal(dem.open_dem(str(data / 'dem.asc')).array,array)
+    assert os.listdir(str(data)) == ['dem.asc']
+
+def test_short_ascii_grids_leave_no_temporary_file(tmp_path,monkeypatch):
+    monkeypatch.setattr(dem,'cache_directory',str(tmp_path / 'cache'))
+    write_ascii(str(tmp_path / 'dem.asc'),np.ones((3,4)),rows=5)
+    with pytest.raises(ValueError):
+        dem.open_dem(str(tmp_path / 'dem.asc'))
+    assert os.listdir(str(tmp_path / 'cache')) == []
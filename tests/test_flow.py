@@ -0,0 +1,44 @@
+import numpy as np
+
+from pylem.physics.flow import priority_flood, route_over_depressions, topological_levels
+from pylem.physics.landscape import Landscape
+
+pit = np.asarray([[5,5,5,5,5],
+                  [5,3,3,3,5],
+                  [5,3,1,3,4],
+                  [5,3,3,3,5],
+                  [5,5,5,5,5]],dtype=np.float64)
+
+
+def test_priority_flood_fills_a_pit_to_its_spill_point():
+    depressions = priority_flood(pit)
+    lake        = np.zeros(pit.shape,dtype=bool)
+    lake[1:4,1:4] = True
+    filled      = np.where(lake,4.0,pit)
+    np.testing.assert_array_equal(depressions.filled.reshape(pit.shape),filled)
+    np.testing.assert_array_equal(depressions.depth.reshape(pit.shape),filled - pit)
+    # every lake cell drains over the outlet at row 2, column 4
+    np.testing.assert_array_equal(depressions.spill.reshape(pit.shape),np.where(lake,2*5+4,-1))
+
+def test_routed_graph_over_depressions_is_acyclic():
+    landscape = Landscape({'X Dimension Extent': 40,'Y Dimension Extent': 30,'Cell Width': 1})
+    noise     = np.random.RandomState(0).rand(*landscape.shape)
+    landscape.matrix.set_elevation_matrix(3*noise)
+    receivers, gradient = landscape.matrix.get_flow_receivers(fill_depressions=True)
+    levels    = topological_levels(receivers)
+    assert sum(level.shape[0] for level in levels) == receivers.shape[0]
+    filled    = landscape.matrix.get_depressions().filled
+    assert np.all(filled[receivers] <= filled)
+    assert np.all(gradient <= 0)
+
+def test_route_over_depressions_crosses_the_lake():
+    depressions = priority_flood(pit)
+    index       = np.arange(pit.size)
+    # without steepest descent anywhere the flood receivers are taken
+    receivers, routed = route_over_depressions(index,np.zeros(pit.size),depressions,pit.shape)
+    np.testing.assert_array_equal(receivers,depressions.receivers)
+    outlet = 2*5+4
+    cell   = 2*5+2
+    while receivers[cell] != cell:
+        cell = receivers[cell]
+    assert cell == outlet
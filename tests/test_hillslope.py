@@ -0,0 +1,30 @@
+import numpy as np
+
+from pylem.physics.erosion import HillslopeCreep
+
+
+def test_implicit_nine_point_matches_explicit_for_small_steps():
+    elevation = np.random.RandomState(0).rand(30,40)*10
+    implicit  = HillslopeCreep(**{'Mode': 'implicit','Stencil': '9-point'})
+    explicit  = HillslopeCreep(**{'Mode': 'explicit','Stencil': '9-point'})
+    five      = HillslopeCreep(**{'Mode': 'implicit','Stencil': '5-point'})
+    result    = implicit.implicit(elevation,1e-4,1.0)
+    np.testing.assert_allclose(result,explicit.explicit(elevation.copy(),1e-4,1.0),atol=1e-5)
+    assert np.abs(result - five.implicit(elevation,1e-4,1.0)).max() > 1e-4
+    assert np.isclose(result.sum(),elevation.sum())
+
+def test_implicit_nine_point_is_stable_for_large_steps():
+    elevation = np.random.RandomState(1).rand(20,20)
+    result    = HillslopeCreep(**{'Mode': 'implicit','Stencil': '9-point'}).implicit(elevation,1e4,1.0)
+    assert elevation.min() <= result.min() and result.max() <= elevation.max()
+
+def test_single_row_grids_diffuse_with_their_cell_width():
+    from pylem.physics.landscape import Landscape
+    results = []
+    for width in (1.0,10.0):
+        landscape = Landscape({'X Dimension Extent': 20*width,'Y Dimension Extent': width,'Cell Width': width})
+        landscape.matrix.set_elevation_matrix(np.sin(np.arange(20.0))[None,:])
+        HillslopeCreep(**{'Mode': 'explicit'}).simulate_grid(landscape.matrix,landscape.xs,landscape.ys,dt=width*width)
+        results.append(landscape.matrix.get_elevation_matrix())
+    # dt scaled with the squared cell width gives the same diffusion
+    np.testing.assert_allclose(results[0],results[1])
@@ -0,0 +1,42 @@
+import numpy as np
+
+from pylem.model.history import HistoryReader, HistoryWriter
+from pylem.physics.landscape import Landscape
+
+
+def make_landscape():
+    return Landscape({'X Dimension Extent': 30,'Y Dimension Extent': 20,'Cell Width': 1})
+
+def append(writer,landscape,step):
+    landscape.matrix.set_elevation_matrix(np.full(landscape.shape,float(step)))
+    writer.append(step,float(step),landscape)
+
+def test_resume_after_a_crash_keeps_frames_up_to_the_checkpoint(tmp_path):
+    directory = str(tmp_path / 'history')
+    landscape = make_landscape()
+    writer    = HistoryWriter(directory,landscape.shape)
+    for step in range(0,26):
+        append(writer,landscape,step)
+        if step in (10,20):
+            writer.sync()
+    # the run dies at step 25 without closing, it resumes from step 20
+    writer = HistoryWriter(directory,landscape.shape,start_step=20)
+    for step in range(21,30):
+        append(writer,landscape,step)
+    writer.close()
+    history = HistoryReader(directory)
+    assert list(history.steps) == list(range(30))
+    np.testing.assert_array_equal(history['elevation'][:,0,0],np.arange(30.0))
+
+def test_sync_writes_the_incomplete_chunk(tmp_path):
+    directory = str(tmp_path / 'history')
+    landscape = make_landscape()
+    writer    = HistoryWriter(directory,landscape.shape)
+    for step in range(5):
+        append(writer,landscape,step)
+    writer.sync()
+    assert list(HistoryReader(directory).steps) == list(range(5))
+    for step in range(5,20):
+        append(writer,landscape,step)
+    writer.close()
+    np.testing.assert_array_equal(HistoryReader(directory)['elevation'][:,3,4],np.arange(20.0))
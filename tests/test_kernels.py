@@ -0,0 +1,52 @@
+import numpy as np
+
+from pylem.physics import kernels
+from pylem.physics.flow import d8_offsets, d8_distance
+from pylem.physics.landscape import Landscape
+
+
+def make_landscape(seed):
+    landscape = Landscape({'X Dimension Extent': 40,'Y Dimension Extent': 30,'Cell Width': 2})
+    rows, columns = np.indices(landscape.shape)
+    noise = np.random.RandomState(seed).rand(*landscape.shape)
+    landscape.matrix.set_elevation_matrix(0.2*rows + 0.1*columns + 3*noise)
+    return landscape
+
+def walk(kernel,seed):
+    landscape   = make_landscape(seed)
+    matrix      = landscape.matrix
+    depressions = matrix.get_depressions()
+    bedrock     = matrix._bedrock_map.copy()
+    sediment    = matrix._sediment_map.copy()
+    elevation   = matrix._get_elevation().copy()
+    order       = np.random.RandomState(seed).permutation(landscape.shape[0]*landscape.shape[1])
+    kernel(bedrock,sediment,elevation,depressions.depth.copy(),depressions.spill,order,
+           d8_offsets,d8_distance*matrix._dxy,1.0,1.5,0.0,0.1,0.1,1.0,100)
+    return bedrock, sediment, elevation
+
+def flood(kernel,seed):
+    elevation = np.pad(make_landscape(seed).matrix.get_elevation_matrix(),(1,1),
+                       'constant',constant_values=(np.nan,np.nan))
+    columns   = elevation.shape[1]
+    z         = elevation.ravel()
+    closed    = np.isnan(z)
+    # the cells along the grid edge seed the queue, as in priority_flood
+    edge      = np.zeros(elevation.shape,dtype=bool)
+    edge[1,1:-1] = edge[-2,1:-1] = edge[1:-1,1] = edge[1:-1,-2] = True
+    seeds     = np.flatnonzero(edge)
+    filled    = z.copy()
+    receivers = np.arange(z.shape[0])
+    spill     = np.full(z.shape[0],-1,dtype=np.intp)
+    offsets   = (d8_offsets[:,0]*columns + d8_offsets[:,1]).astype(np.intp)
+    kernel(z,closed,seeds.astype(np.intp),offsets,filled,receivers,spill)
+    return filled, receivers, spill
+
+def test_compiled_waterbots_match_python():
+    for seed in range(3):
+        for compiled, python in zip(walk(kernels.walk_waterbots,seed),walk(kernels.python_walk_waterbots,seed)):
+            np.testing.assert_array_equal(compiled,python)
+
+def test_compiled_flood_fill_matches_python():
+    for seed in range(3):
+        for compiled, python in zip(flood(kernels.flood_fill,seed),flood(kernels.python_flood_fill,seed)):
+            np.testing.assert_array_equal(compiled,python)
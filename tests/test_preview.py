@@ -0,0 +1,27 @@
+import numpy as np
+
+from pylem.controller.batch import BatchController
+from pylem.model.model import MainModel
+
+config = {
+    'simulation': {'X Dimension Extent': 40,'Y Dimension Extent': 30,'Cell Width': 1,
+                   'Time': 10,'Iterations/Time Interval': 1},
+    'surface'   : {'type': 'random','seed': 3},
+    'waterbot'  : {'enabled': True},
+}
+
+
+def test_previews_leave_the_random_state_alone():
+    model = MainModel()
+    state = np.random.get_state()[1].copy()
+    model.preview_surface(BatchController(model,config),generation=0)
+    assert np.array_equal(np.random.get_state()[1],state)
+
+def test_previews_do_not_change_a_run():
+    model    = MainModel()
+    expected = model.run_simulation(BatchController(model,config)).matrix.get_elevation_matrix()
+    # a preview of another seed rebuilt while the next run is set up
+    other    = {**config,'surface': {'type': 'random','seed': 4}}
+    model.preview_surface(BatchController(model,other),generation=1)
+    result   = model.run_simulation(BatchController(model,config)).matrix.get_elevation_matrix()
+    np.testing.assert_array_equal(result,expected)
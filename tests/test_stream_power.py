@@ -0,0 +1,58 @@
+import warnings
+import numpy as np
+
+from pylem.physics.erosion import ImplicitStreamPower, StreamPowerErosion
+from pylem.physics.flow import accumulate, topological_levels
+from pylem.physics.landscape import Landscape
+
+# 0 -> 1 -> 2 and 3 -> 1, cell 2 is the outlet
+receivers = np.asarray([1,2,2,1])
+
+
+def make_landscape():
+    landscape = Landscape({'X Dimension Extent': 30,'Y Dimension Extent': 20,'Cell Width': 1})
+    rows, columns = np.indices(landscape.shape)
+    noise = np.random.RandomState(0).rand(*landscape.shape)
+    landscape.matrix.set_elevation_matrix(0.5*rows + 0.1*columns + noise)
+    return landscape
+
+def route(depth):
+    solver      = StreamPowerErosion(**{'Sediment Discharge %': 100})
+    levels      = topological_levels(receivers)
+    capacity    = np.asarray([1.0,0.0,0.0,0.0])
+    max_erosion = np.asarray([5.0,0.0,0.0,0.0])
+    return solver.route_sediment(levels,receivers,capacity,max_erosion,np.asarray(depth))
+
+def test_drainage_area_accumulates_along_receivers():
+    levels = topological_levels(receivers)
+    np.testing.assert_array_equal(accumulate(levels,receivers,np.ones(4)),[1,3,4,1])
+
+def test_lake_traps_up_to_its_depth_and_passes_the_rest_on():
+    dz = route([0.0,0.3,0.0,0.0])
+    np.testing.assert_allclose(dz,[-1.0,0.3,0.7,0.0])
+
+def test_deep_lake_traps_everything():
+    dz = route([0.0,2.0,0.0,0.0])
+    np.testing.assert_allclose(dz,[-1.0,1.0,0.0,0.0])
+
+def test_newton_matches_the_closed_form_for_a_linear_law():
+    solver = ImplicitStreamPower()
+    z0     = np.asarray([5.0,3.0,1.0])
+    zr     = np.asarray([1.0,2.0,0.5])
+    f      = np.asarray([0.5,2.0,10.0])
+    dx     = np.asarray([1.0,1.4,1.0])
+    closed = (z0 + f/dx*zr) / (1.0 + f/dx)
+    np.testing.assert_allclose(solver.newton(z0,zr,f,dx,1.0,0.0),closed,atol=1e-9)
+
+def test_sub_linear_slope_exponent_steps_without_warnings():
+    landscape = make_landscape()
+    before    = landscape.matrix.get_elevation_matrix()
+    solver    = ImplicitStreamPower(**{'Exponential Law': 0.7,'Gradient Constant': 0.5})
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        for step in range(5):
+            landscape.step([solver],dt=10.0)
+    after = landscape.matrix.get_elevation_matrix()
+    assert np.all(np.isfinite(after))
+    assert np.all(after <= before + 1e-12)
+    assert after.sum() < before.sum()
@@ -0,0 +1,26 @@
+import numpy as np
+
+from pylem.physics.landscape import Landscape
+from pylem.physics.surface import GaussianElevation, InitialSurface
+
+gaussian = {'type': 'gaussian','weight:(A)': 10,'xy_ratio:(c/d)': 4,'decay:(b)': 5,
+            'xy rotation:(degrees)': 0}
+
+
+def test_gaussian_peaks_in_the_middle_of_a_non_square_domain():
+    params    = {'X Dimension Extent': 200,'Y Dimension Extent': 100,'Cell Width': 1}
+    landscape = Landscape(params)
+    landscape.assign_elevations(InitialSurface({**gaussian,**params}))
+    elevation = landscape.matrix.get_elevation_matrix()
+    assert elevation.shape == (100,200)
+    assert np.unravel_index(np.argmax(elevation),elevation.shape) == (50,100)
+    # c/d > 1 narrows the hill along x, i.e. across the columns
+    assert elevation[50,100+20] < elevation[50+20,100]
+
+def test_gaussian_point_and_grid_evaluation_agree():
+    params  = {'X Dimension Extent': 30,'Y Dimension Extent': 20,'Cell Width': 1}
+    surface = GaussianElevation(**{**gaussian,**params,'xy rotation:(degrees)': 30})
+    xs, ys  = np.arange(20.0), np.arange(30.0)
+    grid    = surface.get_elevation_grid(xs,ys)
+    for ix, iy in [(0,0),(5,17),(19,29),(10,3)]:
+        assert np.isclose(grid[ix,iy],surface.get_elevation(np.asarray([xs[ix],ys[iy]])))
@@ -0,0 +1,37 @@
+import time
+
+from pylem.controller.batch import BatchController
+from pylem.model.model import MainModel
+from pylem.model.worker import LatestValue, SimulationWorker
+
+config = {
+    'simulation': {'X Dimension Extent': 200,'Y Dimension Extent': 200,'Cell Width': 1,
+                   'Time': 100000,'Iterations/Time Interval': 1},
+    'surface'   : {'type': 'random','seed': 3},
+    'waterbot'  : {'enabled': True},
+}
+
+
+def fail(control=None):
+    raise RuntimeError('broken run')
+
+def test_worker_publishes_errors():
+    errors = LatestValue()
+    worker = SimulationWorker(fail,errors=errors)
+    worker.start()
+    worker.join()
+    error  = errors.take()
+    assert isinstance(error,RuntimeError) and str(error) == 'broken run'
+
+def test_restart_waits_for_the_old_run_off_the_calling_thread():
+    model      = MainModel()
+    controller = BatchController(model,config)
+    model.start_simulation(controller)
+    first      = model.worker
+    time.sleep(0.2)
+    model.start_simulation(controller)
+    second     = model.worker
+    model.cancel_simulation(wait=True)
+    second.join()
+    assert not first.is_alive()
+    assert controller.error_channel.take() is None